@@ -4,57 +4,291 @@ from __future__ import print_function
 import sys
 import os
 import csv
+import collections
+import argparse
+import render_cache
+import render_profiles
+import render_scheduler
 
-def read_csv(filename):
-    ret = [] 
-    with open(filename, 'rb') as csvfile:
+BLENDER = "/home/john/src/blender-2.77-linux-glibc211-x86_64/blender"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENE = os.path.join(SCRIPT_DIR, "..", "blender-scenes", "jonas_part.blend")
+
+#Columns that must be present in the CSV file
+CSV_FIELDS = ('name', 'insulator_dia', 'conductor_dia', 'conductor_strand_dia',
+              'insulator_material', 'conductor_material', 'conductor_pitch',
+              'colors', 'preassure_tool')
+
+#Accepted spellings of boolean columns
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no', '')
+
+#Diameters in the CSV file are in mm. Multiply by this to get a radius in m
+MM_DIA_TO_RADIUS = 1.0 / 2000.0
+
+#Raised for a CSV row that does not describe a valid part
+class RowError(ValueError):
+    def __init__(self, line, msg):
+        super(RowError, self).__init__("line %d: %s" % (line, msg))
+        self.line = line
+
+#One validated row of the CSV file. Lengths are in m
+class PartJob:
+    __slots__ = ('line', 'name', 'conductor_radius', 'conductor_strand_radius',
+                 'insulator_radius', 'conductor_pitch', 'conductor_material',
+                 'insulator_material', 'colors', 'preassure_tool')
+
+    def __init__(self, line, row):
+        self.line = line
+        self.name = row['name'].strip()
+        self.conductor_radius = self.length(row, 'conductor_dia')
+        self.conductor_strand_radius = self.length(row, 'conductor_strand_dia')
+        self.insulator_radius = self.length(row, 'insulator_dia')
+        self.conductor_pitch = self.number(row, 'conductor_pitch')
+        self.conductor_material = row['conductor_material'].strip()
+        self.insulator_material = row['insulator_material'].strip()
+        self.colors = tuple(row['colors'].split())
+        self.preassure_tool = self.boolean(row, 'preassure_tool')
+
+        if not self.name:
+            raise RowError(line, "name is empty")
+        if not self.colors:
+            raise RowError(line, "no colors")
+        if not self.conductor_material or not self.insulator_material:
+            raise RowError(line, "material is empty")
+        if self.conductor_radius <= 0.0:
+            raise RowError(line, "conductor_dia must be positive")
+        if self.conductor_strand_radius < 0.0 or \
+                self.conductor_strand_radius > self.conductor_radius:
+            raise RowError(line, "conductor_strand_dia must be between 0 and"
+                           " conductor_dia")
+        if self.insulator_radius <= self.conductor_radius:
+            raise RowError(line, "insulator_dia must be larger than"
+                           " conductor_dia")
+        if self.conductor_pitch < 0.0:
+            raise RowError(line, "conductor_pitch is negative")
+
+    def number(self, row, field):
+        try:
+            return float(row[field])
+        except (TypeError, ValueError):
+            raise RowError(self.line, "%s is not a number: %r" %
+                           (field, row[field]))
+
+    def length(self, row, field):
+        return self.number(row, field) * MM_DIA_TO_RADIUS
+
+    def boolean(self, row, field):
+        value = (row[field] or '').strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise RowError(self.line, "%s is not a boolean: %r" %
+                       (field, row[field]))
+
+    #Job record for one colour of the part
+    def job(self, color, output_dir, views = None, render = None):
+        ret = {'conductor_radius': self.conductor_radius,
+               'conductor_material': self.conductor_material,
+               'conductor_strand_radius': self.conductor_strand_radius,
+               'insulator_radius': self.insulator_radius,
+               'preassure_tool': self.preassure_tool,
+               'insulator_material': self.insulator_material,
+               'filename': output_dir + self.name + "-" + color,
+               'color': color,
+               'conductor_pitch': self.conductor_pitch}
+        if views is not None:
+            ret['views'] = views
+        if render is not None:
+            ret['render'] = render
+
+        return ret
+
+#Yield a PartJob or a RowError for each row of a CSV file
+def read_rows(filename):
+    with open(filename, newline = '') as csvfile:
         reader = csv.DictReader(csvfile, delimiter = ';')
+        missing = [f for f in CSV_FIELDS if f not in (reader.fieldnames or ())]
+        if missing:
+            yield RowError(1, "missing columns: %s" % " ".join(missing))
+            return
 
         for row in reader:
-            row['conductor_dia'] = float(row['conductor_dia'])
-            row['insulator_dia'] = float(row['insulator_dia'])
-            row['conductor_strand_dia'] = float(row['conductor_strand_dia'])
-            row['conductor_pitch'] = float(row['conductor_pitch'])
-            row['preassure_tool'] = not bool(row['preassure_tool'])
-            row['colors'] = row['colors'].split()
+            try:
+                yield PartJob(reader.line_num, row)
+            except RowError as e:
+                yield e
+
+#Return a list of the errors in a CSV file. Reads one row at a time
+def validate_csv(filename):
+    return [row for row in read_rows(filename) if isinstance(row, RowError)]
 
-            ret.append(row)
+#Yield a PartJob for each row of a CSV file. Raises RowError on invalid rows
+def read_csv(filename):
+    for row in read_rows(filename):
+        if isinstance(row, RowError):
+            raise row
+        yield row
+
+#Create one job record for each colour of each part
+def make_jobs(parts, output_dir, views = None, render = None):
+    for part in parts:
+        for color in part.colors:
+            yield part.job(color, output_dir, views, render)
+
+#Largest number of variants sent to a worker as one group
+GROUP_SIZE = 32
+
+#Number of geometry signatures waiting for more variants before the oldest
+#group is sent
+PENDING_GROUPS = 64
+
+#Jobs with the same signature share conductor and insulator geometry and only
+#differ in colour and materials
+def geometry_signature(job):
+    return (job['conductor_radius'], job['conductor_strand_radius'],
+            job['insulator_radius'], job['conductor_pitch'],
+            job['preassure_tool'],
+            tuple(tuple(view) for view in job.get('views', ())))
+
+#Group record of jobs sharing one geometry
+def make_group(variants):
+    if len(variants) == 1:
+        return variants[0]
+
+    return {'id': "group:" + variants[0]['filename'], 'variants': variants}
+
+#Yield job records grouped by geometry signature. Jobs are read lazily and
+#at most PENDING_GROUPS partial groups are held back
+def group_jobs(jobs, group_size = GROUP_SIZE, pending = PENDING_GROUPS):
+    groups = collections.OrderedDict()
+    for job in jobs:
+        key = geometry_signature(job)
+        variants = groups.setdefault(key, [])
+        variants.append(job)
 
-    csvfile.close()
+        if len(variants) >= group_size:
+            yield make_group(groups.pop(key))
+        elif len(groups) > pending:
+            yield make_group(groups.popitem(last = False)[1])
 
-    return ret
+    for variants in groups.values():
+        yield make_group(variants)
+
+#Run every job in a fresh blender process
+def run_processes(jobs, blender, on_success = None):
+    blender_cmd = blender + " --background"
+    for job in jobs:
+        #jonas_part.py takes diameters in mm on the command line
+        render = job.get('render', {})
+        cmd = "%s %s --python %s -- %f %s %f %f %s %s \"%s\" %s %f %s" \
+            " \"%s\" %d" \
+            %(blender_cmd, SCENE, os.path.join(SCRIPT_DIR, "jonas_part.py"),
+                job['conductor_radius'] / MM_DIA_TO_RADIUS,
+                job['conductor_material'],
+                job['conductor_strand_radius'] / MM_DIA_TO_RADIUS,
+                job['insulator_radius'] / MM_DIA_TO_RADIUS,
+                str(job['preassure_tool']), job['insulator_material'],
+                job['filename'], job['color'], job['conductor_pitch'],
+                ",".join("%s:%s" % view
+                         for view in render_cache.job_views(job)),
+                render.get('profile', ""), render.get('threads', 0))
+
+        print(cmd)
+        if os.system(cmd) == 0 and on_success is not None:
+            on_success(job)
 
 def main():
 #Handle arguments
-    if len(sys.argv) < 3:
-        print("Need exactly 2 arguments. CSV file and output dir", file=sys.stderr)
-        return -1
+    parser = argparse.ArgumentParser(description = "Render parts in a CSV file")
+    parser.add_argument("csv", help = "CSV file")
+    parser.add_argument("output_dir", help = "Output dir")
+    parser.add_argument("--blender", default = BLENDER,
+                        help = "Blender executable")
+    parser.add_argument("--workers", type = int, default = 0,
+                        help = "Number of persistent blender workers. 0 starts"
+                        " one blender process per job")
+    parser.add_argument("--threads", type = int, default = 0,
+                        help = "Render threads per worker. 0 lets blender"
+                        " decide")
+    parser.add_argument("--timeout", type = float, default = None,
+                        help = "Seconds before a job is considered hung")
+    parser.add_argument("--retries", type = int, default = 1,
+                        help = "Number of retries for failed jobs")
+    parser.add_argument("--journal", default = None,
+                        help = "Journal of finished jobs. Defaults to"
+                        " journal.jsonl in the output dir")
+    parser.add_argument("--views", nargs = "+", default = None,
+                        metavar = "CAMERA:SUFFIX",
+                        help = "Cameras to render and the suffix of their"
+                        " images. Defaults to CamTop:top CamBottom:bottom")
+    parser.add_argument("--profile", default = None,
+                        choices = sorted(render_profiles.PROFILES) + ['auto'],
+                        help = "Render profile. 'auto' keeps the scene"
+                        " settings and only tunes tiles and threads. Without"
+                        " a profile the scene settings are used as saved")
+    parser.add_argument("--force", action = "store_true",
+                        help = "Render all jobs even if their images are up"
+                        " to date")
+    args = parser.parse_args()
 
-    csvdata = read_csv(sys.argv[1])
-    output_dir = sys.argv[2]
+    #Report all invalid rows before anything is rendered
+    errors = validate_csv(args.csv)
+    for e in errors:
+        print("%s: %s" % (args.csv, e), file = sys.stderr)
+    if errors:
+        return 1
+
+    output_dir = args.output_dir
     if output_dir[-1] != '/':
         output_dir += '/'
 
-    for part in csvdata:
-        conductor_dia = float(part['conductor_dia'])
-        conductor_material = part['conductor_material']
-        conductor_strand_dia = float(part['conductor_strand_dia'])
-        conductor_pitch = float(part['conductor_pitch'])
-        preassure_tool = str(part['preassure_tool'])
-        insulator_material = part['insulator_material']
-        insulator_dia = float(part['insulator_dia'])
+    views = None
+    if args.views is not None:
+        try:
+            views = render_cache.parse_views(args.views)
+        except ValueError as e:
+            print(e, file = sys.stderr)
+            return 1
+
+    render = None
+    if args.profile is not None:
+        render = render_profiles.resolve(
+            args.profile, n_workers = max(1, args.workers),
+            threads = args.threads)
+
+    jobs = make_jobs(read_csv(args.csv), output_dir, views, render)
+
+    cache = render_cache.RenderCache(os.path.join(output_dir, "manifest.json"),
+                                     SCENE)
+    if not args.force:
+        jobs = cache.filter(jobs)
+
+    if args.workers <= 0:
+        run_processes(jobs, args.blender, cache.update)
+        return 0
 
-        blender_cmd = "/home/john/src/blender-2.77-linux-glibc211-x86_64/blender --background"
-        for color in part['colors']:
-            filename = part['name'] + "-" + color
+    #Build the geometry once for all colour and material variants
+    jobs = group_jobs(jobs)
 
-            cmd = "%s ../blender-scenes/jonas_part.blend --python jonas_part.py -- %f %s %f %f %s %s \"%s\" %s %f"\
-                %(blender_cmd, conductor_dia, conductor_material, conductor_strand_dia, insulator_dia, preassure_tool,
-                    insulator_material, output_dir + filename, color, conductor_pitch)
+    #Keyed by the job hash so that changed rows are not skipped. --force
+    #ignores the records of earlier runs
+    journal = render_scheduler.Journal(
+        args.journal or os.path.join(output_dir, "journal.jsonl"),
+        key = cache.job_hash, resume = not args.force)
+    failures = render_scheduler.schedule(jobs, args.blender, SCENE,
+                                         n_workers = args.workers,
+                                         threads = args.threads,
+                                         timeout = args.timeout,
+                                         retries = args.retries,
+                                         journal = journal,
+                                         on_success = cache.update)
+    for result in failures:
+        print("Failed: %s" % result['id'], file = sys.stderr)
 
-            print(cmd)
-            os.system(cmd)
+    return 1 if failures else 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+import itertools
+import platform
+import resource
+import subprocess
+import traceback
+import tracemalloc
+import bpy
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import cabletools as ct
+import geometrycache
+import part_worker
+import rco
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#Datablock collections counted after each case
+COUNTED_COLLECTIONS = ('objects', 'meshes', 'curves', 'materials',
+                       'node_groups', 'images')
+
+#Columns of the CSV output, in order
+CSV_FIELDS = ('case', 'builder', 'params', 'status', 'time_min', 'time_first',
+              'vertices', 'faces', 'splines', 'spline_points',
+              'render_vertices', 'peak_python_kib', 'max_rss_delta_kib') + \
+    tuple('new_' + name for name in COUNTED_COLLECTIONS)
+
+def printUsage():
+    print("Usage: blender --background --factory-startup --python\
+            benchmark.py -- [--output BASENAME] [--repeat N] [--filter TEXT]\
+            [--quick] [--tessellate]")
+
+#Builders that take a context argument
+def with_context(func):
+    def wrapper(**params):
+        return func(context = bpy.context, **params)
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+#Expand a parameter grid to a list of parameter dicts
+def grid(**axes):
+    names = sorted(axes.keys())
+    return [dict(zip(names, values))
+            for values in itertools.product(*[axes[n] for n in names])]
+
+#Return a list of (builder name, function, params) tuples
+def make_cases(quick = False):
+    lengths = [0.5] if quick else [0.5, 2.0]
+    strand_radii = [0.0005, 0.0002] if quick else [0.0005, 0.0002, 0.0001]
+    pitches = [5.0] if quick else [5.0, 20.0]
+
+    cases = []
+    def add(func, params_list):
+        for params in params_list:
+            cases.append((func.__name__, func, params))
+
+    add(with_context(ct.make_conductor),
+        grid(length = lengths, conductor_radius = [0.002],
+             strand_radius = strand_radii, strand_pitch = pitches,
+             material = ['cu'], clockwize = [False],
+             instanced = [False, True]))
+    add(ct.make_mesh_conductor,
+        grid(length = lengths, conductor_radius = [0.002],
+             strand_radius = strand_radii, strand_pitch = pitches,
+             material = ['cu'], instanced = [False, True]))
+    add(with_context(ct.make_braid),
+        grid(length = lengths, radius = [0.005], bundle_size = [4, 8],
+             n_bundle_pairs = [4, 8] if quick else [4, 8, 12],
+             pitch = pitches, strand_radius = [0.0001], material = ['cu']))
+    add(with_context(ct.make_armour),
+        grid(length = lengths, radius = [0.01], strand_radius = [0.0008],
+             n_strands = [20, 40], pitch = pitches, clockwize = [False],
+             material = ['fe_zn']))
+    add(with_context(ct.make_insulator_array),
+        grid(length = lengths, pitch = [2.0], radius = [0.004],
+             outer_radius = [0.002], inner_radius = [0.0015],
+             material = ['pvc'], colors = ["black brown grey",
+                                           "black brown grey blue green"],
+             clockwize = [False], peel_length = [0.01]))
+    add(with_context(ct.make_part_array),
+        grid(length = lengths, pitch = [2.0], radius = [0.004],
+             clockwize = [False], ins_outer_radius = [0.002],
+             ins_inner_radius = [0.0015], ins_material = ['pvc'],
+             ins_colors = ["black brown grey"], ins_peel_length = [0.01],
+             cond_radius = [0.0015], cond_strand_pitch = [10.0],
+             cond_material = ['cu'], cond_strand_radius = [0.0002]))
+
+    add(with_context(rco.make_bezier_circle), grid(radius = [0.001, 0.1]))
+    add(with_context(rco.make_bezier_helix),
+        grid(length = lengths, pitch = pitches, radius = [0.002],
+             clockwize = [False]))
+    add(with_context(rco.make_mesh_tube),
+        grid(outer_radius = [0.002, 0.02], inner_radius = [0.001],
+             length = lengths))
+    add(with_context(rco.make_mesh_shell_tube),
+        grid(length = lengths, radius = [0.002, 0.02]))
+
+    if quick:
+        return cases
+
+    #Scaling cases
+    add(with_context(ct.make_conductor),
+        grid(length = [0.5], conductor_radius = [0.016],
+             strand_radius = [0.0005], strand_pitch = [5.0],
+             material = ['cu'], clockwize = [False],
+             instanced = [False, True]))
+    add(ct.make_mesh_conductor,
+        grid(length = [0.5], conductor_radius = [0.016],
+             strand_radius = [0.0005], strand_pitch = [5.0],
+             material = ['cu'], instanced = [False, True]))
+    add(with_context(ct.make_conductor),
+        grid(length = [10.0], conductor_radius = [0.002],
+             strand_radius = [0.0002], strand_pitch = [5.0],
+             material = ['cu'], clockwize = [False], instanced = [False]))
+    add(with_context(ct.make_braid),
+        grid(length = [10.0], radius = [0.005], bundle_size = [8],
+             n_bundle_pairs = [12], pitch = [5.0], strand_radius = [0.0001],
+             material = ['cu']))
+    add(with_context(ct.make_armour),
+        grid(length = [10.0], radius = [0.01], strand_radius = [0.0008],
+             n_strands = [40], pitch = [5.0], clockwize = [False],
+             material = ['fe_zn']))
+
+    return cases
+
+#Stable identifier of a case
+def case_id(name, params):
+    return "%s[%s]" % (name, ",".join("%s=%s" % (k, params[k])
+                                      for k in sorted(params.keys())))
+
+#Count geometry of all datablocks that are not part of the template
+def geometry_stats(template, tessellate):
+    ret = {'vertices': 0, 'faces': 0, 'splines': 0, 'spline_points': 0,
+           'render_vertices': None}
+
+    for mesh in bpy.data.meshes:
+        if mesh.as_pointer() not in template['meshes']:
+            ret['vertices'] += len(mesh.vertices)
+            ret['faces'] += len(mesh.polygons)
+
+    for curve in bpy.data.curves:
+        if curve.as_pointer() not in template['curves']:
+            ret['splines'] += len(curve.splines)
+            for spline in curve.splines:
+                ret['spline_points'] += len(spline.bezier_points) + \
+                    len(spline.points)
+
+    if tessellate:
+        scene = bpy.context.scene
+        ret['render_vertices'] = 0
+        for obj in scene.objects:
+            if obj.as_pointer() in template['objects'] or \
+                    obj.type not in ('MESH', 'CURVE') or obj.hide_render:
+                continue
+            mesh = obj.to_mesh(scene, True, 'RENDER')
+            ret['render_vertices'] += len(mesh.vertices)
+            bpy.data.meshes.remove(mesh)
+
+    return ret
+
+#Run one case. Returns a result record
+def run_case(name, func, params, template, repeat, tessellate):
+    result = {'case': case_id(name, params), 'builder': name,
+              'params': json.dumps(params, sort_keys = True)}
+    scene = bpy.context.scene
+    counts = dict((c, len(getattr(bpy.data, c))) for c in COUNTED_COLLECTIONS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+
+    try:
+        #Timed runs are not traced, since tracing slows down every allocation
+        for i in range(repeat):
+            start = time.perf_counter()
+            func(**params)
+            times.append(time.perf_counter() - start)
+
+            #Keep the datablocks of the last run for counting
+            if i < repeat - 1:
+                part_worker.reset_scene(template, scene)
+
+        result.update(geometry_stats(template, tessellate))
+        for c in COUNTED_COLLECTIONS:
+            result['new_' + c] = len(getattr(bpy.data, c)) - counts[c]
+
+        #Separate run for the peak Python memory
+        part_worker.reset_scene(template, scene)
+        tracemalloc.start()
+        func(**params)
+        result['peak_python_kib'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+        result['status'] = 'ok'
+    except Exception:
+        traceback.print_exc()
+        result['status'] = 'failed'
+        result['error'] = traceback.format_exc()
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        part_worker.reset_scene(template, scene)
+
+    if times:
+        result['time_min'] = min(times)
+        result['time_first'] = times[0]
+    result['max_rss_delta_kib'] = \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+
+    return result
+
+#Describe the code and machine the benchmark ran on
+def environment():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                         cwd = SCRIPT_DIR,
+                                         universal_newlines = True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {'commit': commit, 'blender': bpy.app.version_string,
+            'python': platform.python_version(),
+            'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+def write_results(basename, results):
+    with open(basename + ".json", 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f,
+                  indent = 1, sort_keys = True)
+
+    with open(basename + ".csv", 'w') as f:
+        writer = csv.DictWriter(f, CSV_FIELDS, extrasaction = 'ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+def main():
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    parser = argparse.ArgumentParser(prog = "benchmark.py",
+                                     description = "Benchmark the object "
+                                     "builders")
+    parser.add_argument("--output", default = "benchmark",
+                        help = "Base name of the .json and .csv output")
+    parser.add_argument("--repeat", type = int, default = 3,
+                        help = "Runs per case. The fastest is reported")
+    parser.add_argument("--filter", default = None,
+                        help = "Only run cases whose id contains this text")
+    parser.add_argument("--quick", action = "store_true",
+                        help = "Small grid without the scaling cases")
+    parser.add_argument("--tessellate", action = "store_true",
+                        help = "Also count render tessellated vertices")
+    parser.add_argument("--geometry-cache", action = "store_true",
+                        help = "Leave the on-disk geometry cache enabled")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:
+        printUsage()
+        return -1
+
+    if not args.geometry_cache:
+        geometrycache.CACHE_DIR = ''
+
+    template = part_worker.snapshot()
+    results = []
+    for name, func, params in make_cases(args.quick):
+        cid = case_id(name, params)
+        if args.filter is not None and args.filter not in cid:
+            continue
+
+        result = run_case(name, func, params, template, args.repeat,
+                          args.tessellate)
+        print("%s: %s %.3f s" % (cid, result['status'],
+                                 result.get('time_min', float('nan'))))
+        results.append(result)
+
+    write_results(args.output, results)
+
+if __name__ == '__main__':
+    main()
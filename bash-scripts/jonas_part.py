@@ -1,66 +1,156 @@
 import sys
+import os
 import bpy
 import cabletools as ct
-import cablematerials as cm
+import lod
 import math
+import rco
+import tracing
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import render_cache
+import render_profiles
 
 def printUsage():
     print("Usage: blender --background --python batch_part.py --[CONDUCTOR DIA]\
             [CONDUCTOR MATERIAL] [CONDUCTOR STRAND DIA] [INSULATOR DIA]\
-            [INSULATOR PREASSURE TOOL] [INSULATOR MATERIAL] [FILENAME] [COLOR]")
+            [INSULATOR PREASSURE TOOL] [INSULATOR MATERIAL] [FILENAME] [COLOR]\
+            [CONDUCTOR PITCH] [CAMERA:SUFFIX,...] [RENDER PROFILE]\
+            [RENDER THREADS]")
 
-def main():
-#Handle arguments
-    argv = sys.argv
-    argv = argv[argv.index("--") + 1:]
+#Parse a boolean command line argument
+def parse_bool(value):
+    return value.strip().lower() in ('1', 'true', 'yes')
 
-    conductor_r = float(argv[0]) / 2000.0
-    conductor_material = argv[1]
-    conductor_strand_r = float(argv[2]) / 2000.0
-    insulator_r = float(argv[3]) / 2000.0
+#Create a job record from command line arguments. Diameters are in mm
+def job_from_argv(argv):
+    job = {'conductor_radius': float(argv[0]) / 2000.0,
+           'conductor_material': argv[1],
+           'conductor_strand_radius': float(argv[2]) / 2000.0,
+           'insulator_radius': float(argv[3]) / 2000.0,
+           'preassure_tool': parse_bool(argv[4]),
+           'insulator_material': argv[5],
+           'filename': argv[6],
+           'color': argv[7],
+           'conductor_pitch': float(argv[8]),
+           'views': render_cache.parse_views(argv[9].split(',')) if
+           len(argv) > 9 else render_cache.DEFAULT_VIEWS}
+    if len(argv) > 10 and argv[10]:
+        #Resolved like batch_part does, so the threads and tile size match
+        threads = int(argv[11]) if len(argv) > 11 else 0
+        job['render'] = render_profiles.resolve(argv[10], threads = threads)
 
-    preassure_tool = bool(argv[4])
-    insulator_inner_r = conductor_r
-    if preassure_tool:
-        insulator_inner_r -= conductor_strand_r
+    return job
 
-    insulator_material = argv[5]
+#Rotation of the part in the template scene
+ROTATION = (0, math.pi / 2.0, 0)
 
-    filename = argv[6]
+#Create the conductor of a job. Radii are in m
+def build_conductor(job, context):
+    conductor = ct.make_conductor(length = 0.53,
+                                  conductor_radius = job['conductor_radius'],
+                                  strand_radius =
+                                  job['conductor_strand_radius'],
+                                  strand_pitch = job['conductor_pitch'],
+                                  material = job['conductor_material'],
+                                  clockwize = False,
+                                  context = context)
+    conductor.rotation_euler = ROTATION
 
-    color = cm.INSULATOR_COLORS[argv[7]]
+    return conductor
 
-    conductor_pitch = float(argv[8])
+#Create the insulator of a job. Radii are in m
+def build_insulator(job, context):
+    insulator_inner_r = job['conductor_radius']
+    if job['preassure_tool']:
+        insulator_inner_r -= job['conductor_strand_radius']
 
-#Setup blender variables
-    context = bpy.context
-    scene = context.scene
-    rotation = (0, math.pi / 2.0, 0)
-
-#Create conductor
-    conductor = ct.make_conductor(0.53, conductor_r, conductor_strand_r,
-            conductor_pitch, conductor_material, context)
-    conductor.rotation_euler = rotation
-
-#Create insulator
     insulator = ct.make_insulator(inner_radius = insulator_inner_r,
-                                  outer_radius = insulator_r,
+                                  outer_radius = job['insulator_radius'],
                                   length = 0.52,
                                   peel_length = 0.01,
-                                  material = insulator_material,
-                                  color = color,
+                                  material = job['insulator_material'],
+                                  color_name = job['color'],
                                   context = context)
-    insulator.rotation_euler = rotation
+    insulator.rotation_euler = ROTATION
+
+    return insulator
+
+#Tessellate objects for the closest of the rendered views
+def tessellate(job, objects, scene):
+    lod.apply(objects, scene, [scene.objects[camera]
+                               for camera, suffix in
+                               render_cache.job_views(job)])
+
+#Create the part described by a job record
+def build_part(job, context):
+    conductor = build_conductor(job, context)
+    insulator = build_insulator(job, context)
+    tessellate(job, [conductor, insulator], context.scene)
+
+    return conductor, insulator
+
+#Turn a part built for the previous job into the part of the next job. Both
+#jobs must have the same geometry signature. Only materials are swapped,
+#unless the insulator colours have different stripe profiles
+def apply_variant(job, previous, part, context):
+    conductor, insulator = part
+
+    if job['conductor_material'] != previous['conductor_material']:
+        ct.set_conductor_material(conductor, job['conductor_material'])
+
+    if ct.insulator_shape(job['color']) != \
+            ct.insulator_shape(previous['color']):
+        rco.delete_object(insulator, context)
+        insulator = build_insulator(job, context)
+        tessellate(job, [insulator], context.scene)
+    elif job['color'] != previous['color'] or \
+            job['insulator_material'] != previous['insulator_material']:
+        ct.set_insulator_material(insulator, job['insulator_material'],
+                                  job['color'], job['insulator_radius'])
+
+    return conductor, insulator
+
+#Render every view of the job. Persistent render data lets the views after
+#the first reuse the synced scene, BVH and compiled shaders. The render
+#settings used are written next to each image
+def render_part(job, scene):
+    filename = os.path.join(".", job['filename'])
+    scene.render.use_persistent_data = True
+
+    if 'render' in job:
+        settings = render_profiles.apply(scene, job['render'])
+    else:
+        settings = render_profiles.used_settings(scene)
+
+    for camera, suffix in render_cache.job_views(job):
+        scene.camera = scene.objects[camera]
+        scene.render.filepath = filename + "_" + suffix + ".png"
+        bpy.ops.render.render(write_still = True)
+        render_profiles.write_sidecar(scene.render.filepath,
+                                      dict(settings, camera = camera))
+
+def main():
+#Handle arguments
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:]
+    if len(argv) < 9:
+        printUsage()
+        return -1
+
+    job = job_from_argv(argv)
+
+#Setup blender variables
+    context = bpy.context
 
+    with tracing.span("build_part", "job"):
+        build_part(job, context)
 
 #Render image
-    bpy.data.scenes["Scene"].camera = scene.objects["CamTop"]
-    bpy.data.scenes["Scene"].render.filepath = "./" + filename + "_top.png"
-    bpy.ops.render.render(write_still = True)
+    with tracing.span("render_part", "job"):
+        render_part(job, bpy.data.scenes["Scene"])
 
-    bpy.data.scenes["Scene"].camera = scene.objects["CamBottom"]
-    bpy.data.scenes["Scene"].render.filepath = "./" + filename + "_bottom.png"
-    bpy.ops.render.render(write_still = True)
+    tracing.write_job(job['filename'])
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,201 @@
+import sys
+import os
+import glob
+import json
+import time
+import traceback
+import bpy
+import rco
+import tracing
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import cabletools as ct
+import jonas_part
+
+#Lines starting with this are read by batch_part.py. Everything else on stdout
+#is blender output
+RESULT_PREFIX = "@@part_worker "
+
+#Status of the record written when the worker is ready for jobs
+READY_STATUS = "ready"
+
+#Datablock collections that are reset between jobs. Materials and node groups
+#are kept so that they can be reused by the next job
+RESET_COLLECTIONS = ('objects', 'curves', 'meshes')
+
+def printUsage():
+    print("Usage: blender --background [SCENE] --python part_worker.py --\
+            [--spool DIR]")
+    print("Reads one JSON job record per line from stdin, or from *.json\
+            files in the spool directory. {\"command\": \"quit\"} stops the\
+            worker.")
+
+#Remember which datablocks belong to the scene template
+def snapshot():
+    ret = {}
+    for name in RESET_COLLECTIONS:
+        ret[name] = set(d.as_pointer() for d in getattr(bpy.data, name))
+
+    return ret
+
+#Remove all objects, curves and meshes that are not part of the template
+def reset_scene(template, scene):
+    for obj in list(bpy.data.objects):
+        if obj.as_pointer() in template['objects']:
+            continue
+        if obj.name in scene.objects:
+            scene.objects.unlink(obj)
+        bpy.data.objects.remove(obj)
+
+    for name in RESET_COLLECTIONS[1:]:
+        collection = getattr(bpy.data, name)
+        for data in list(collection):
+            if data.as_pointer() not in template[name] and data.users == 0:
+                collection.remove(data)
+
+#Return the identifier of a job record
+def job_id(job):
+    return job.get('id', job.get('filename'))
+
+#Clean the scene after a job. Returns the rco.reset_tracked report
+def clean_scene(template, scene):
+    with tracing.span("reset_scene", "job"):
+        reclaimed = rco.reset_tracked(RESET_COLLECTIONS)
+        #Catch anything that was not created by a builder
+        reset_scene(template, scene)
+
+    return reclaimed
+
+#Render the variants of a group that share one geometry. The part is built
+#once and only its materials are swapped between variants. Returns a list of
+#result records, one per variant
+def run_variants(variants, template, scene):
+    context = bpy.context
+    results = []
+    part = None
+    previous = None
+
+    #Variants with the same insulator profile follow each other
+    variants = sorted(variants, key = lambda v: repr(
+        ct.insulator_shape(v['color'])))
+
+    for variant in variants:
+        start = time.time()
+        try:
+            if part is None:
+                with tracing.span("build_part", "job"):
+                    part = jonas_part.build_part(variant, context)
+            else:
+                with tracing.span("apply_variant", "job"):
+                    part = jonas_part.apply_variant(variant, previous, part,
+                                                    context)
+            previous = variant
+            with tracing.span("render_part", "job"):
+                jonas_part.render_part(variant, scene)
+            result = {'status': 'ok'}
+        except Exception:
+            traceback.print_exc()
+            result = {'status': 'failed', 'error': traceback.format_exc()}
+            #The part may be half swapped. Build the next variant from scratch
+            part = None
+            clean_scene(template, scene)
+
+        result['id'] = job_id(variant)
+        result['time'] = time.time() - start
+        results.append(result)
+
+    return results
+
+#Build and render a job, or a group of jobs with a 'variants' list. Returns a
+#result record. The record of a group holds the records of its variants
+def run_job(job, template):
+    scene = bpy.data.scenes["Scene"]
+    start = time.time()
+
+    try:
+        variants = run_variants(job.get('variants', [job]), template, scene)
+    finally:
+        reclaimed = clean_scene(template, scene)
+
+    if 'variants' in job:
+        failed = [r for r in variants if r['status'] != 'ok']
+        result = {'status': 'failed' if failed else 'ok',
+                  'variants': variants}
+    else:
+        result = variants[0]
+
+    result['id'] = job_id(job)
+    result['removed'] = reclaimed['removed']
+    result['reclaimed_bytes'] = reclaimed['bytes']
+    result['time'] = time.time() - start
+
+    trace = tracing.write_job(result['id'])
+    if trace is not None:
+        result['trace'] = trace
+
+    return result
+
+#Write a result record for the controlling process
+def report(result):
+    sys.stdout.write(RESULT_PREFIX + json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+#Yield job records from stdin
+def stdin_jobs():
+    for line in iter(sys.stdin.readline, ''):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+#Yield job records from files in a spool directory. A file is claimed by
+#renaming it to *.processing before it is read, so it is not read again after
+#a restart, a quit command or a crash, or by another worker. Read files are
+#renamed to *.done
+def spool_jobs(spool_dir, poll_interval = 1.0):
+    while True:
+        filenames = sorted(glob.glob(os.path.join(spool_dir, "*.json")))
+        if not filenames:
+            time.sleep(poll_interval)
+            continue
+
+        for filename in filenames:
+            claimed = filename + ".processing"
+            try:
+                os.rename(filename, claimed)
+            except OSError:
+                #Claimed by another worker
+                continue
+
+            try:
+                with open(claimed) as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            yield json.loads(line)
+            finally:
+                #Also runs when the worker stops at a quit command
+                os.rename(claimed, filename + ".done")
+
+def main():
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    if "--spool" in argv:
+        jobs = spool_jobs(argv[argv.index("--spool") + 1])
+    elif argv:
+        printUsage()
+        return -1
+    else:
+        jobs = stdin_jobs()
+
+    template = snapshot()
+    report({'status': READY_STATUS})
+
+    for job in jobs:
+        if job.get('command') == 'quit':
+            break
+
+        report(run_job(job, template))
+
+if __name__ == '__main__':
+    main()
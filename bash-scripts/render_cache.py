@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULE_DIR = os.path.join(SCRIPT_DIR, "..", "blender-script", "modules")
+
+#Modules whose source affects the rendered images
+MODULES = ('cabletools.py', 'cablematerials.py', 'geometrycache.py', 'lod.py',
+           'rco.py', 'cablegeom/__init__.py', 'cablegeom/curves.py',
+           'cablegeom/layout.py', 'cablegeom/mesh.py',
+           'cablegeom/tessellation.py')
+
+#Scripts in this directory whose source affects the rendered images
+SCRIPTS = ('jonas_part.py', 'part_worker.py', 'render_profiles.py')
+
+#(camera name, output suffix) of the views rendered when a job record has no
+#'views' field
+DEFAULT_VIEWS = (("CamTop", "top"), ("CamBottom", "bottom"))
+
+#Job record fields that name the output rather than describe its content
+IGNORED_FIELDS = ('id', 'filename')
+
+#Render settings that depend on the host and worker count but do not change
+#the image
+IGNORED_RENDER_FIELDS = ('threads', 'tile_size')
+
+#Return the sha256 hex digest of a file
+def file_digest(filename):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+#Return the (camera name, output suffix) pairs rendered for a job
+def job_views(job):
+    return [tuple(view) for view in job.get('views', DEFAULT_VIEWS)]
+
+#Parse views given as CAMERA:SUFFIX strings
+def parse_views(specs):
+    ret = []
+    for spec in specs:
+        camera, sep, suffix = spec.partition(':')
+        if not sep or not camera or not suffix:
+            raise ValueError("View must be CAMERA:SUFFIX, got %r" % spec)
+        ret.append((camera, suffix))
+
+    return ret
+
+#Return the image files rendered for a job by jonas_part.render_part
+def job_outputs(job):
+    return [job['filename'] + "_" + suffix + ".png"
+            for camera, suffix in job_views(job)]
+
+#Skips jobs whose output images were rendered from identical inputs.
+#The hash of every rendered job is kept in a JSON manifest next to the images
+class RenderCache:
+    def __init__(self, manifest, scene, module_dir = MODULE_DIR,
+                 render_settings = None):
+        self.manifest = manifest
+        self.lock = threading.Lock()
+
+        # Digest of everything that is shared by all jobs
+        h = hashlib.sha256()
+        h.update(file_digest(os.path.join(SCRIPT_DIR, scene)).encode())
+        sources = [(name, os.path.join(module_dir, name)) for name in MODULES]
+        sources += [(name, os.path.join(SCRIPT_DIR, name)) for name in SCRIPTS]
+        for name, filename in sources:
+            if os.path.exists(filename):
+                h.update(name.encode())
+                h.update(file_digest(filename).encode())
+        h.update(json.dumps(render_settings, sort_keys = True).encode())
+        self.base_digest = h.hexdigest()
+
+        self.hashes = {}
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self.hashes = json.load(f)
+
+    #Stable hash of a job and the shared inputs
+    def job_hash(self, job):
+        params = dict((k, v) for k, v in job.items()
+                      if k not in IGNORED_FIELDS)
+        if 'render' in params:
+            params['render'] = dict((k, v) for k, v in params['render'].items()
+                                    if k not in IGNORED_RENDER_FIELDS)
+        h = hashlib.sha256(self.base_digest.encode())
+        h.update(json.dumps(params, sort_keys = True).encode())
+
+        return h.hexdigest()
+
+    #True if the job has been rendered with the same inputs and its images
+    #still exist
+    def is_fresh(self, job):
+        key = os.path.basename(job['filename'])
+        if self.hashes.get(key) != self.job_hash(job):
+            return False
+
+        return all(os.path.exists(f) for f in job_outputs(job))
+
+    #Yield the jobs that need to be rendered
+    def filter(self, jobs):
+        for job in jobs:
+            if self.is_fresh(job):
+                print("Up to date: %s" % job['filename'])
+                continue
+            yield job
+
+    #Record that a job has been rendered
+    def update(self, job):
+        key = os.path.basename(job['filename'])
+        with self.lock:
+            self.hashes[key] = self.job_hash(job)
+            tmp = self.manifest + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.hashes, f, indent = 1, sort_keys = True)
+            os.rename(tmp, self.manifest)
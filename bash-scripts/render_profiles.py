@@ -0,0 +1,132 @@
+import os
+import json
+
+#Named render settings. Tile size and threads of 'auto' are chosen by
+#resolve() from the host and the resolution
+PROFILES = {
+    'proof': {'resolution_x': 640, 'resolution_y': 360, 'samples': 16,
+              'max_bounces': 2, 'diffuse_bounces': 1, 'glossy_bounces': 1,
+              'transmission_bounces': 2, 'adaptive_sampling': True,
+              'tile_size': 'auto', 'threads': 'auto'},
+    'catalogue': {'resolution_x': 1280, 'resolution_y': 720, 'samples': 128,
+                  'max_bounces': 4, 'diffuse_bounces': 2,
+                  'glossy_bounces': 2, 'transmission_bounces': 4,
+                  'adaptive_sampling': True, 'tile_size': 'auto',
+                  'threads': 'auto'},
+    'print': {'resolution_x': 3840, 'resolution_y': 2160, 'samples': 512,
+              'max_bounces': 8, 'diffuse_bounces': 4, 'glossy_bounces': 4,
+              'transmission_bounces': 8, 'adaptive_sampling': False,
+              'tile_size': 'auto', 'threads': 'auto'},
+}
+
+#Tile sizes tried by auto_tile_size, largest first
+TILE_SIZES = (256, 128, 64, 32, 16)
+
+#Fewest tiles per render thread before a smaller tile size is used
+TILES_PER_THREAD = 4
+
+#Number of render threads for a worker when several workers share the host
+def auto_threads(n_workers = 1, cpu_count = None):
+    if cpu_count is None:
+        cpu_count = os.cpu_count() or 1
+
+    return max(1, cpu_count // max(1, n_workers))
+
+#Largest CPU tile size that still gives every thread several tiles
+def auto_tile_size(resolution_x, resolution_y, threads):
+    for size in TILE_SIZES:
+        tiles = -(-resolution_x // size) * -(-resolution_y // size)
+        if tiles >= TILES_PER_THREAD * threads:
+            return size
+
+    return TILE_SIZES[-1]
+
+#Return the settings of a profile with the automatic values filled in
+# @param name Name of a profile in PROFILES, or 'auto' to keep the resolution
+# and sampling of the scene and only tune tiles and threads
+# @param n_workers Number of workers sharing the host
+# @param threads Render threads per worker. 0 picks from the core count
+# @param resolution (x, y) used to tune tiles for the 'auto' profile
+def resolve(name, n_workers = 1, threads = 0, resolution = None):
+    if name == 'auto':
+        settings = {'tile_size': 'auto', 'threads': 'auto'}
+    elif name in PROFILES:
+        settings = dict(PROFILES[name])
+    else:
+        raise ValueError("Unknown render profile %r. Choose one of: %s"
+                         % (name, " ".join(sorted(PROFILES) + ['auto'])))
+    settings['profile'] = name
+
+    if settings['threads'] == 'auto':
+        settings['threads'] = threads if threads > 0 else \
+            auto_threads(n_workers)
+
+    if settings['tile_size'] == 'auto':
+        if 'resolution_x' in settings:
+            resolution = (settings['resolution_x'], settings['resolution_y'])
+        #Without a resolution the scene decides at render time
+        if resolution is not None:
+            settings['tile_size'] = auto_tile_size(resolution[0],
+                                                   resolution[1],
+                                                   settings['threads'])
+
+    return settings
+
+#Apply render settings to a scene. Settings that the blender version does
+#not support are skipped. Returns the settings the render will use
+def apply(scene, settings):
+    render = scene.render
+    if 'resolution_x' in settings:
+        render.resolution_x = settings['resolution_x']
+        render.resolution_y = settings['resolution_y']
+        render.resolution_percentage = 100
+
+    render.threads_mode = 'FIXED'
+    render.threads = settings['threads']
+
+    tile_size = settings['tile_size']
+    if tile_size == 'auto':
+        tile_size = auto_tile_size(
+            render.resolution_x * render.resolution_percentage // 100,
+            render.resolution_y * render.resolution_percentage // 100,
+            settings['threads'])
+    render.tile_x = tile_size
+    render.tile_y = tile_size
+
+    cycles = getattr(scene, 'cycles', None)
+    if cycles is not None:
+        for name in ('samples', 'max_bounces', 'diffuse_bounces',
+                     'glossy_bounces', 'transmission_bounces'):
+            if name in settings:
+                setattr(cycles, name, settings[name])
+        #Adaptive sampling only exists in newer blender versions
+        if 'adaptive_sampling' in settings and \
+                hasattr(cycles, 'use_adaptive_sampling'):
+            cycles.use_adaptive_sampling = settings['adaptive_sampling']
+
+    return used_settings(scene, settings.get('profile'))
+
+#Read the render settings of a scene
+def used_settings(scene, profile = None):
+    render = scene.render
+    ret = {'profile': profile, 'engine': render.engine,
+           'resolution_x': render.resolution_x,
+           'resolution_y': render.resolution_y,
+           'resolution_percentage': render.resolution_percentage,
+           'tile_x': render.tile_x, 'tile_y': render.tile_y,
+           'threads_mode': render.threads_mode, 'threads': render.threads}
+
+    cycles = getattr(scene, 'cycles', None)
+    if cycles is not None:
+        for name in ('samples', 'max_bounces', 'diffuse_bounces',
+                     'glossy_bounces', 'transmission_bounces',
+                     'use_adaptive_sampling'):
+            if hasattr(cycles, name):
+                ret[name] = getattr(cycles, name)
+
+    return ret
+
+#Write the settings an image was rendered with next to it
+def write_sidecar(image, settings):
+    with open(image + ".json", 'w') as f:
+        json.dump(settings, f, indent = 1, sort_keys = True)
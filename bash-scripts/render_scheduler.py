@@ -0,0 +1,322 @@
+from __future__ import print_function
+import os
+import json
+import queue
+import threading
+import subprocess
+import traceback
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(SCRIPT_DIR, "part_worker.py")
+
+#Must match part_worker.RESULT_PREFIX
+RESULT_PREFIX = "@@part_worker "
+
+#Must match part_worker.READY_STATUS
+READY_STATUS = "ready"
+
+#Seconds a worker may take to start blender and load the scene
+STARTUP_TIMEOUT = 300
+
+class JobTimeout(Exception):
+    def __init__(self, msg):
+        super(JobTimeout, self).__init__(msg)
+
+class WorkerError(Exception):
+    def __init__(self, msg):
+        super(WorkerError, self).__init__(msg)
+
+#Return the identifier of a job record
+def job_id(job):
+    return job.get('id', job.get('filename'))
+
+#Split the result of a job into (job, result) pairs, one for each variant of
+#a group or a single pair for a plain job
+def split_result(job, result):
+    if 'variants' not in job:
+        return [(job, result)]
+
+    by_id = dict((r['id'], r) for r in result.get('variants', ()))
+    ret = []
+    for variant in job['variants']:
+        vresult = by_id.get(job_id(variant))
+        if vresult is None:
+            #The whole group failed before this variant was rendered
+            vresult = dict(result, id = job_id(variant))
+            vresult.pop('variants', None)
+        ret.append((variant, vresult))
+
+    return ret
+
+#Return a job for the given variants of a job
+def with_variants(job, variants):
+    if 'variants' not in job:
+        return variants[0]
+
+    return dict(job, variants = variants)
+
+#Append only record of finished jobs. Lets an interrupted run resume where it
+#stopped. Records are keyed by key(job), so a job whose content changed since
+#it was recorded is rendered again
+class Journal:
+    def __init__(self, filename, key = job_id, resume = True):
+        self.filename = filename
+        self.key = key
+        self.done = set()
+        self.lock = threading.Lock()
+
+        if resume and os.path.exists(filename):
+            with open(filename) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partly written last line of an interrupted run
+                        continue
+                    if record.get('status') == 'ok' and 'key' in record:
+                        self.done.add(record['key'])
+
+    def is_done(self, job):
+        return self.key(job) in self.done
+
+    def record(self, job, result):
+        result = dict(result, key = self.key(job))
+        with self.lock:
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if result.get('status') == 'ok':
+                self.done.add(result['key'])
+
+#A persistent blender process running part_worker.py
+class Worker:
+    def __init__(self, blender, scene, threads = 0, log = None):
+        self.blender = blender
+        self.scene = scene
+        self.threads = threads
+        self.log = log
+        self.process = None
+        self.results = None
+
+    #Start blender and wait until the worker is ready for jobs, so that the
+    #startup does not count against the timeout of the first job
+    def start(self, timeout = STARTUP_TIMEOUT):
+        cmd = [self.blender, "--background", self.scene]
+        if self.threads > 0:
+            cmd += ["--threads", str(self.threads)]
+        cmd += ["--python", WORKER_SCRIPT, "--"]
+
+        self.process = subprocess.Popen(cmd, stdin = subprocess.PIPE,
+                                        stdout = subprocess.PIPE,
+                                        universal_newlines = True)
+        self.results = queue.Queue()
+        reader = threading.Thread(target = self.read_output,
+                                  args = (self.process, self.results))
+        reader.daemon = True
+        reader.start()
+
+        try:
+            ready = self.results.get(timeout = timeout)
+        except queue.Empty:
+            self.kill()
+            raise WorkerError("Worker did not start within %s s" % timeout)
+
+        if ready is None or ready.get('status') != READY_STATUS:
+            self.kill()
+            raise WorkerError("Worker exited during startup")
+
+    #Forward result records from the worker stdout to the results queue
+    def read_output(self, process, results):
+        for line in iter(process.stdout.readline, ''):
+            if line.startswith(RESULT_PREFIX):
+                results.put(json.loads(line[len(RESULT_PREFIX):]))
+            elif self.log is not None:
+                self.log.write(line)
+        # Worker exited
+        results.put(None)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if not self.alive():
+            return
+        try:
+            self.process.stdin.write(json.dumps({'command': 'quit'}) + "\n")
+            self.process.stdin.close()
+            self.process.wait(timeout = 30)
+        except (IOError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+            self.process.wait()
+
+    #Send a job to the worker and wait for its result
+    def run(self, job, timeout = None):
+        if not self.alive():
+            self.start()
+
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except IOError:
+            self.kill()
+            return {'id': job_id(job), 'status': 'failed',
+                    'error': 'Worker closed its input'}
+
+        try:
+            result = self.results.get(timeout = timeout)
+        except queue.Empty:
+            self.kill()
+            raise JobTimeout("Job %s timed out after %s s"
+                             % (job_id(job), timeout))
+
+        if result is None:
+            self.kill()
+            return {'id': job_id(job), 'status': 'failed',
+                    'error': 'Worker exited'}
+
+        return result
+
+#Render jobs with a pool of persistent blender workers
+# @param jobs Iterable of job records. Consumed lazily. A record with a
+# 'variants' list is a group of jobs sharing one geometry
+# @param blender Blender executable
+# @param scene Scene template
+# @param n_workers Number of blender processes
+# @param threads Render threads per worker. 0 lets blender decide
+# @param timeout Seconds before a job is considered hung. None waits forever
+# @param retries Number of times a failed job is retried
+# @param journal Journal of finished jobs or None
+# @param queue_size Maximum number of jobs waiting for a worker
+# @param log File receiving blender output or None
+# @param on_success Called with each job or variant that rendered
+# successfully
+# @return List of results of jobs that failed after all retries
+def schedule(jobs, blender, scene, n_workers = 1, threads = 0, timeout = None,
+             retries = 1, journal = None, queue_size = None, log = None,
+             on_success = None):
+    if queue_size is None:
+        queue_size = 2 * n_workers
+    job_queue = queue.Queue(maxsize = queue_size)
+    failures = []
+    failures_lock = threading.Lock()
+    #Set when the producer stops early. Consumers then stop after their
+    #current job
+    stop = threading.Event()
+    workers = []
+
+    #Queue an item unless all consumers have stopped. Returns False if they
+    #have, since nothing would take the item off the queue
+    def put(item):
+        while True:
+            try:
+                job_queue.put(item, timeout = 1)
+                return True
+            except queue.Full:
+                if not any(t.is_alive() for t in consumers):
+                    return False
+
+    def produce():
+        for job in jobs:
+            if journal is not None:
+                variants = [v for v in job.get('variants', [job])
+                            if not journal.is_done(v)]
+                if not variants:
+                    print("Skipping finished job %s" % job_id(job))
+                    continue
+                job = with_variants(job, variants)
+            if not put(job):
+                print("All workers stopped. Remaining jobs are not rendered")
+                return
+        for i in range(n_workers):
+            if not put(None):
+                return
+
+    #Render a job, retrying failed variants. Returns the results of the
+    #variants that failed after all retries
+    def run(worker, job):
+        for attempt in range(retries + 1):
+            if attempt > 0 and stop.is_set():
+                break
+            try:
+                result = worker.run(job, timeout)
+            except JobTimeout as e:
+                result = {'id': job_id(job), 'status': 'timeout',
+                          'error': str(e)}
+            except WorkerError as e:
+                result = {'id': job_id(job), 'status': 'failed',
+                          'error': str(e)}
+            except Exception:
+                worker.kill()
+                result = {'id': job_id(job), 'status': 'failed',
+                          'error': traceback.format_exc()}
+
+            #Only the failed variants of a group are retried
+            failed = []
+            for variant, vresult in split_result(job, result):
+                vresult['attempt'] = attempt + 1
+                if journal is not None:
+                    journal.record(variant, vresult)
+                print("%s: %s" % (vresult['id'], vresult['status']))
+                if vresult['status'] == 'ok':
+                    if on_success is not None:
+                        on_success(variant)
+                else:
+                    failed.append((variant, vresult))
+
+            if not failed:
+                return []
+            job = with_variants(job, [v for v, r in failed])
+
+        return [r for v, r in failed]
+
+    def consume():
+        worker = Worker(blender, scene, threads, log)
+        workers.append(worker)
+        try:
+            while not stop.is_set():
+                try:
+                    job = job_queue.get(timeout = 1)
+                except queue.Empty:
+                    continue
+                if job is None:
+                    break
+
+                #A broken journal or cache must not stop the consumer
+                try:
+                    failed = run(worker, job)
+                except Exception:
+                    traceback.print_exc()
+                    failed = [{'id': job_id(v), 'status': 'failed',
+                               'error': traceback.format_exc()}
+                              for v in job.get('variants', [job])]
+
+                if failed:
+                    with failures_lock:
+                        failures.extend(failed)
+        finally:
+            worker.stop()
+
+    consumers = [threading.Thread(target = consume) for i in range(n_workers)]
+    for t in consumers:
+        t.start()
+    try:
+        produce()
+    except KeyboardInterrupt:
+        stop.set()
+        #Do not wait for the running jobs. The journal lets the run resume
+        for worker in workers:
+            worker.kill()
+        raise
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for t in consumers:
+            t.join()
+
+    return failures
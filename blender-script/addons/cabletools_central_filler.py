@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 
@@ -31,17 +32,27 @@ bpy.types.Scene.CT_make_central_filler_material = bpy.props.EnumProperty(
         name = "Material")
 
 
+def make_central_filler(params, context):
+    return ct.make_central_filler(params['length'], params['diameter'] / 2,
+                                  0.001, params['material'], context)
+
+
+COMPONENTS = [rebuild.Component("filler", make_central_filler,
+                                ('diameter', 'length', 'material'))]
+
+
 class MakeCentralFiller(bpy.types.Operator):
     bl_idname = "ct.make_central_filler"
     bl_label = "Make central filler"
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        radius = context.scene.CT_make_central_filler_diameter / 2
-        length = context.scene.CT_make_central_filler_length
-        material = context.scene.CT_make_central_filler_material
+        scene = context.scene
+        params = {'diameter': scene.CT_make_central_filler_diameter,
+                  'length': scene.CT_make_central_filler_length,
+                  'material': scene.CT_make_central_filler_material}
 
-        ct.make_central_filler(length, radius, 0.001, material, context)
+        rebuild.run(self.bl_idname, "Filler", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_armour_diameter = bpy.props.FloatProperty(
@@ -58,6 +59,24 @@ bpy.types.Scene.CT_make_armour_material = bpy.props.EnumProperty(
         items = ct.CONDUCTOR_MATERIALS,
         name = "Material")
 
+def make_armour(params, context):
+    return ct.make_armour(length=params['length'],
+                          radius=params['diameter'] / 2.0,
+                          strand_radius=params['strand_dia'] / 2.0,
+                          n_strands=params['n_strands'],
+                          pitch=1.0 / params['pitch'],
+                          clockwize=params['clockwize'],
+                          material=params['material'],
+                          context=context)
+
+def set_material(obj, params, context):
+    ct.set_conductor_material(obj, params['material'])
+
+COMPONENTS = [rebuild.Component("armour", make_armour,
+                                ('length', 'diameter', 'strand_dia', 'pitch',
+                                 'n_strands', 'clockwize'),
+                                [(('material',), set_material)])]
+
 # Operator class
 class MakeArmour(bpy.types.Operator):
     bl_idname = "ct.make_armour"
@@ -66,23 +85,15 @@ class MakeArmour(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-
-        length = scene.CT_make_armour_length
-        material = scene.CT_make_armour_material
-        armour_radius = scene.CT_make_armour_diameter / 2.0
-        strand_radius = scene.CT_make_armour_strand_dia / 2.0
-        strand_pitch = 1.0 / scene.CT_make_armour_pitch
-        n_strands = scene.CT_make_armour_n_strands
-        clockwize = scene.CT_make_armour_clockwize 
-
-        ct.make_armour(length=length, 
-                       radius=armour_radius, 
-                       strand_radius=strand_radius,
-                       n_strands=n_strands, 
-                       pitch=strand_pitch, 
-                       clockwize=clockwize,
-                       material=material, 
-                       context=context)
+        params = {'length': scene.CT_make_armour_length,
+                  'material': scene.CT_make_armour_material,
+                  'diameter': scene.CT_make_armour_diameter,
+                  'strand_dia': scene.CT_make_armour_strand_dia,
+                  'pitch': scene.CT_make_armour_pitch,
+                  'n_strands': scene.CT_make_armour_n_strands,
+                  'clockwize': scene.CT_make_armour_clockwize}
+
+        rebuild.run(self.bl_idname, "Armour", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 
@@ -62,6 +63,26 @@ bpy.types.Scene.CT_make_braid_material = bpy.props.EnumProperty(
     items=ct.CONDUCTOR_MATERIALS, name="Material")
 
 
+def make_braid(params, context):
+    strand_radius = params['strand_dia'] / 2.0
+    braid_radius = (params['diameter'] / 2.0) + 2.0 * strand_radius
+
+    return ct.make_braid(params['length'], braid_radius,
+                         params['bundle_size'], params['n_bundle_pairs'],
+                         1 / params['pitch'], strand_radius,
+                         params['material'], context)
+
+
+def set_material(obj, params, context):
+    ct.set_conductor_material(obj, params['material'])
+
+
+COMPONENTS = [rebuild.Component("braid", make_braid,
+                                ('length', 'strand_dia', 'diameter', 'pitch',
+                                 'bundle_size', 'n_bundle_pairs'),
+                                [(('material',), set_material)])]
+
+
 # Operator class
 class MakeBraid(bpy.types.Operator):
     bl_idname = "ct.make_braid"
@@ -70,18 +91,15 @@ class MakeBraid(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-
-        length = scene.CT_make_braid_length
-        material = scene.CT_make_braid_material
-        strand_radius = scene.CT_make_braid_strand_dia / 2.0
-        braid_radius = (scene.CT_make_braid_diameter / 2.0
-                        ) + 2.0 * strand_radius
-        strand_pitch = 1 / scene.CT_make_braid_pitch
-        bundle_size = scene.CT_make_braid_bundle_size
-        n_bundle_pairs = scene.CT_make_braid_n_bundle_pairs
-
-        ct.make_braid(length, braid_radius, bundle_size, n_bundle_pairs,
-                      strand_pitch, strand_radius, material, context)
+        params = {'length': scene.CT_make_braid_length,
+                  'material': scene.CT_make_braid_material,
+                  'strand_dia': scene.CT_make_braid_strand_dia,
+                  'diameter': scene.CT_make_braid_diameter,
+                  'pitch': scene.CT_make_braid_pitch,
+                  'bundle_size': scene.CT_make_braid_bundle_size,
+                  'n_bundle_pairs': scene.CT_make_braid_n_bundle_pairs}
+
+        rebuild.run(self.bl_idname, "Braid", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_conductor_diameter = bpy.props.FloatProperty(
@@ -47,6 +48,19 @@ bpy.types.Scene.CT_make_conductor_material = bpy.props.EnumProperty(
         items = ct.CONDUCTOR_MATERIALS,
         name = "Material")
 
+def make_conductor(params, context):
+    return ct.make_conductor(params['length'], params['diameter'] / 2.0,
+                             params['strand_dia'] / 2.0,
+                             1.0 / params['pitch'], params['material'],
+                             False, context)
+
+def set_material(obj, params, context):
+    ct.set_conductor_material(obj, params['material'])
+
+COMPONENTS = [rebuild.Component("conductor", make_conductor,
+                                ('length', 'diameter', 'strand_dia', 'pitch'),
+                                [(('material',), set_material)])]
+
 # Operator class
 class MakeConductor(bpy.types.Operator):
     bl_idname = "ct.make_conductor"
@@ -55,15 +69,13 @@ class MakeConductor(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
+        params = {'length': scene.CT_make_conductor_length,
+                  'material': scene.CT_make_conductor_material,
+                  'diameter': scene.CT_make_conductor_diameter,
+                  'strand_dia': scene.CT_make_conductor_strand_dia,
+                  'pitch': scene.CT_make_conductor_pitch}
 
-        length = scene.CT_make_conductor_length
-        material = scene.CT_make_conductor_material
-        conductor_radius = scene.CT_make_conductor_diameter / 2.0
-        strand_radius = scene.CT_make_conductor_strand_dia / 2.0
-        strand_pitch = 1.0 / scene.CT_make_conductor_pitch
-
-        ct.make_conductor(length, conductor_radius, strand_radius,
-                strand_pitch, material, context)
+        rebuild.run(self.bl_idname, "Conductor", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_insulator_outer_dia = bpy.props.FloatProperty(
@@ -42,6 +43,16 @@ bpy.types.Scene.CT_make_insulator_color_name = bpy.props.EnumProperty(
         items = ct.INSULATOR_COLORS,
         name = 'Color name')
 
+def make_insulator(params, context):
+    return ct.make_insulator(params['inner_dia'] / 2.0,
+                             params['outer_dia'] / 2.0, params['length'], 0.0,
+                             params['material'], params['color_name'],
+                             context)
+
+COMPONENTS = [rebuild.Component("insulator", make_insulator,
+                                ('outer_dia', 'inner_dia', 'length',
+                                 'material', 'color_name'))]
+
 # Operator class
 class MakeInsulator(bpy.types.Operator):
     bl_idname = "ct.make_insulator"
@@ -50,14 +61,13 @@ class MakeInsulator(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-        outer_radius = scene.CT_make_insulator_outer_dia / 2.0
-        inner_radius = scene.CT_make_insulator_inner_dia / 2.0
-        length = scene.CT_make_insulator_length
-        material = scene.CT_make_insulator_material
-        color_name = scene.CT_make_insulator_color_name
-
-        ct.make_insulator(inner_radius, outer_radius, length, 0.0, material,
-                color_name, context)
+        params = {'outer_dia': scene.CT_make_insulator_outer_dia,
+                  'inner_dia': scene.CT_make_insulator_inner_dia,
+                  'length': scene.CT_make_insulator_length,
+                  'material': scene.CT_make_insulator_material,
+                  'color_name': scene.CT_make_insulator_color_name}
+
+        rebuild.run(self.bl_idname, "Insulator", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -5,6 +5,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_lap_diameter = bpy.props.FloatProperty(
@@ -29,6 +30,13 @@ bpy.types.Scene.CT_make_lap_material = bpy.props.EnumProperty(
         items = ct.LAP_MATERIALS,
         name = "Material")
 
+def make_lap(params, context):
+    return ct.make_lap(params['length'], params['diameter'] / 2.0,
+                       params['material'], context)
+
+COMPONENTS = [rebuild.Component("lap", make_lap,
+                                ('length', 'material', 'diameter'))]
+
 # Operator class
 class MakeLap(bpy.types.Operator):
     bl_idname = "ct.make_lap"
@@ -37,12 +45,11 @@ class MakeLap(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
+        params = {'length': scene.CT_make_lap_length,
+                  'material': scene.CT_make_lap_material,
+                  'diameter': scene.CT_make_lap_diameter}
 
-        length = scene.CT_make_lap_length
-        material = scene.CT_make_lap_material
-        radius = scene.CT_make_lap_diameter / 2.0
-
-        ct.make_lap(length, radius, material, context)
+        rebuild.run(self.bl_idname, "Lap", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
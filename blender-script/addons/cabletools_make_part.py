@@ -6,6 +6,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_part_cond_diameter = bpy.props.FloatProperty(
@@ -74,6 +75,34 @@ bpy.types.Scene.CT_make_part_ins_peel_length = bpy.props.FloatProperty(
         min = 0.001,
         max = 0.1)
 
+def make_insulator(params, context):
+    return ct.make_insulator(params['cond_diameter'] / 2.0,
+                             params['ins_outer_dia'] / 2.0, params['length'],
+                             params['ins_peel_length'],
+                             params['ins_material'], params['ins_color_name'],
+                             context)
+
+def make_conductor(params, context):
+    return ct.make_mesh_conductor(params['length'],
+                                  params['cond_diameter'] / 2.0,
+                                  params['cond_strand_dia'] / 2.0,
+                                  1.0 / params['cond_pitch'],
+                                  params['cond_material'])
+
+def set_conductor_material(obj, params, context):
+    ct.set_conductor_material(obj, params['cond_material'])
+
+#Parts of the part and the parameters they depend on
+COMPONENTS = [
+        rebuild.Component("insulator", make_insulator,
+                          ('length', 'ins_outer_dia', 'ins_material',
+                           'ins_color_name', 'ins_peel_length',
+                           'cond_diameter')),
+        rebuild.Component("conductor", make_conductor,
+                          ('length', 'cond_diameter', 'cond_strand_dia',
+                           'cond_pitch'),
+                          [(('cond_material',), set_conductor_material)])]
+
 # Operator class
 class MakePart(bpy.types.Operator):
     bl_idname = "ct.make_part"
@@ -82,26 +111,17 @@ class MakePart(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-        
-        length = scene.CT_make_part_length
-
-        # Insulator params
-        outer_radius = scene.CT_make_part_ins_outer_dia / 2.0
-        inner_radius = scene.CT_make_part_cond_diameter / 2.0
-        insulator_material = scene.CT_make_part_ins_material
-        color_name = scene.CT_make_part_ins_color_name
-        peel_length = scene.CT_make_part_ins_peel_length
-
-        # Conductor params
-        conductor_radius = inner_radius
-        conductor_strand_radius = scene.CT_make_part_cond_strand_dia / 2.0
-        conductor_material = scene.CT_make_part_cond_material
-        conductor_pitch = 1.0 / scene.CT_make_part_cond_pitch
-
-        # Create part
-        ct.make_part(length, outer_radius, color_name, insulator_material,
-                     peel_length, conductor_radius, conductor_material,
-                     conductor_strand_radius, conductor_pitch, context)
+        params = {'length': scene.CT_make_part_length,
+                  'ins_outer_dia': scene.CT_make_part_ins_outer_dia,
+                  'ins_material': scene.CT_make_part_ins_material,
+                  'ins_color_name': scene.CT_make_part_ins_color_name,
+                  'ins_peel_length': scene.CT_make_part_ins_peel_length,
+                  'cond_diameter': scene.CT_make_part_cond_diameter,
+                  'cond_strand_dia': scene.CT_make_part_cond_strand_dia,
+                  'cond_material': scene.CT_make_part_cond_material,
+                  'cond_pitch': scene.CT_make_part_cond_pitch}
+
+        rebuild.run(self.bl_idname, "Part", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
@@ -6,6 +6,7 @@ bl_info = {
 
 import bpy
 import cabletools as ct
+import rebuild
 
 # Create properties
 bpy.types.Scene.CT_make_part_array_cond_diameter = bpy.props.FloatProperty(
@@ -97,6 +98,49 @@ bpy.types.Scene.CT_make_part_array_pitch = bpy.props.FloatProperty(
         min = 0.005,
         max = 2)
 
+#Parameters shared by conductors and insulators
+ARRAY_PARAMS = ('length', 'radius', 'pitch', 'clockwize')
+
+def make_conductors(params, context):
+    return ct.make_conductor_array(
+            length = params['length'],
+            pitch = 1.0 / params['pitch'],
+            radius = params['radius'],
+            conductor_radius = params['cond_diameter'] / 2.0,
+            strand_pitch = 1.0 / params['cond_pitch'],
+            material = params['cond_material'],
+            strand_radius = params['cond_strand_dia'] / 2.0,
+            clockwize = params['clockwize'],
+            n_conductors = params['n_parts'],
+            context = context)
+
+def make_insulators(params, context):
+    return ct.make_insulator_array(
+            length = params['length'],
+            pitch = 1.0 / params['pitch'],
+            radius = params['radius'],
+            outer_radius = params['ins_outer_dia'] / 2.0,
+            inner_radius = params['cond_diameter'] / 2.0,
+            material = params['ins_material'],
+            colors = params['colors'],
+            clockwize = params['clockwize'],
+            peel_length = params['ins_peel_length'],
+            context = context)
+
+def set_conductor_material(obj, params, context):
+    ct.set_conductor_material(obj, params['cond_material'])
+
+#Parts of the array and the parameters they depend on
+COMPONENTS = [
+        rebuild.Component("conductors", make_conductors,
+                          ARRAY_PARAMS + ('n_parts', 'cond_diameter',
+                                          'cond_strand_dia', 'cond_pitch'),
+                          [(('cond_material',), set_conductor_material)]),
+        rebuild.Component("insulators", make_insulators,
+                          ARRAY_PARAMS + ('ins_outer_dia', 'ins_material',
+                                          'colors', 'ins_peel_length',
+                                          'cond_diameter'))]
+
 # Operator class
 class MakePartArray(bpy.types.Operator):
     bl_idname = "ct.make_part_array"
@@ -105,41 +149,22 @@ class MakePartArray(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-        
-        # Array params
-        length = scene.CT_make_part_array_length
-        radius = scene.CT_make_part_array_radius
-        pitch = 1.0 / scene.CT_make_part_array_pitch
-        clockwize = scene.CT_make_part_array_clockwize
-
-        # Insulator params
-        outer_radius = scene.CT_make_part_array_ins_outer_dia / 2.0
-        inner_radius = scene.CT_make_part_array_cond_diameter / 2.0
-        insulator_material = scene.CT_make_part_array_ins_material
-        insulator_colors = scene.CT_make_part_array_colors
-        peel_length = scene.CT_make_part_array_ins_peel_length
-
-        # Conductor params
-        conductor_radius = inner_radius
-        conductor_strand_radius = scene.CT_make_part_array_cond_strand_dia / 2.0
-        conductor_material = scene.CT_make_part_array_cond_material
-        conductor_pitch = 1.0 / scene.CT_make_part_array_cond_pitch
-
-        # Create array
-        ct.make_part_array(length = length,
-                           pitch = pitch,
-                           radius = radius,
-                           clockwize = clockwize,
-                           ins_outer_radius = outer_radius,
-                           ins_inner_radius = inner_radius,
-                           ins_material = insulator_material,
-                           ins_colors = insulator_colors,
-                           cond_radius = conductor_radius,
-                           ins_peel_length = peel_length,
-                           cond_strand_pitch = conductor_pitch,
-                           cond_material = conductor_material,
-                           cond_strand_radius = conductor_strand_radius,
-                           context = context)
+        params = {'length': scene.CT_make_part_array_length,
+                  'radius': scene.CT_make_part_array_radius,
+                  'pitch': scene.CT_make_part_array_pitch,
+                  'clockwize': scene.CT_make_part_array_clockwize,
+                  'ins_outer_dia': scene.CT_make_part_array_ins_outer_dia,
+                  'ins_material': scene.CT_make_part_array_ins_material,
+                  'colors': scene.CT_make_part_array_colors,
+                  'n_parts': len(scene.CT_make_part_array_colors.split()),
+                  'ins_peel_length':
+                  scene.CT_make_part_array_ins_peel_length,
+                  'cond_diameter': scene.CT_make_part_array_cond_diameter,
+                  'cond_strand_dia': scene.CT_make_part_array_cond_strand_dia,
+                  'cond_material': scene.CT_make_part_array_cond_material,
+                  'cond_pitch': scene.CT_make_part_array_cond_pitch}
+
+        rebuild.run(self.bl_idname, "PartArray", COMPONENTS, params, context)
 
         return {'FINISHED'}
 
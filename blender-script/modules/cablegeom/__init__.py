@@ -0,0 +1,17 @@
+## @package cablegeom
+# Geometry of cable parts as plain NumPy arrays.
+# Nothing in this package uses bpy, so it can be shared with the Inkscape
+# extensions, exporters and worker processes running outside of blender.
+# cabletools and rco upload the arrays to blender datablocks.
+
+
+## Throw this exception for invalid input to a generator
+class InputError(Exception):
+    def __init__(self, msg):
+        super(InputError, self).__init__(msg)
+
+
+# curves and mesh are imported by their users, so that the layout does not
+# pull them in
+from . import layout
+from . import tessellation
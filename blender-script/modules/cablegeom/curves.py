@@ -0,0 +1,313 @@
+## @package cablegeom.curves
+# Control points and handles of bezier and poly curves.
+# Bezier generators return a tuple of (n, 3) arrays
+# (co, handle_left, handle_right).
+
+import math
+import numpy as np
+from cablegeom import InputError
+
+
+## Calculate the handle length of a bezier circle arc
+# @param radius Radius of the arc
+# @param dtheta Angle between two control points
+# @return Distance between a control point and its handles
+def handle_length(radius, dtheta):
+    return (4.0 / 3.0) * math.tan(math.pi / (2.0 * (
+        (2.0 * math.pi) / dtheta))) * radius
+
+
+## Calculate a bezier circle in the XY-plane
+# @param radius Radius of the circle
+# @return Tuple of (4, 3) arrays (co, handle_left, handle_right)
+def bezier_circle(radius):
+    dtheta = math.pi / 2.0
+    hh = math.sqrt(radius**2 + handle_length(radius, dtheta)**2)
+    htheta = math.acos(radius / hh)
+
+    theta = -dtheta * np.arange(4)
+    co = np.zeros((4, 3))
+    co[:, 0] = radius * np.cos(theta)
+    co[:, 1] = radius * np.sin(theta)
+
+    handle_left = np.zeros((4, 3))
+    handle_left[:, 0] = hh * np.cos(theta + htheta)
+    handle_left[:, 1] = hh * np.sin(theta + htheta)
+
+    handle_right = np.zeros((4, 3))
+    handle_right[:, 0] = hh * np.cos(theta - htheta)
+    handle_right[:, 1] = hh * np.sin(theta - htheta)
+
+    return co, handle_left, handle_right
+
+
+## Calculate a closed slice of a tube section
+# The slice is centred on start_angle and made of an outer and an inner arc
+# joined by straight edges.
+# @param outer_radius Outer radius of the tube
+# @param inner_radius Inner radius of the tube
+# @param amount Part of a full revolution covered by the slice
+# @param start_angle Angle of the centre of the slice
+# @return Tuple of (8, 3) arrays (co, handle_left, handle_right)
+def tube_section_slice(outer_radius, inner_radius, amount, start_angle):
+    dtheta = (2.0 * math.pi * amount) / 2.0
+
+    handle_radius_l = math.sqrt(outer_radius**2 +
+                                handle_length(outer_radius, dtheta)**2)
+    handle_radius_s = math.sqrt(inner_radius**2 +
+                                handle_length(inner_radius, dtheta)**2)
+    handle_theta = math.acos(outer_radius / handle_radius_l)
+
+    def point(radius, angle):
+        angle += start_angle
+        return (radius * math.cos(angle), radius * math.sin(angle), 0.0)
+
+    outer_start = point(outer_radius, dtheta)
+    outer_end = point(outer_radius, -dtheta)
+
+    co = [outer_start,
+          outer_start,
+          point(outer_radius, 0.0),
+          outer_end,
+          outer_end,
+          point(inner_radius, -dtheta),
+          point(inner_radius, 0.0),
+          point(inner_radius, dtheta)]
+    handle_left = [outer_start,
+                   outer_start,
+                   point(handle_radius_l, handle_theta),
+                   point(handle_radius_l, -dtheta + handle_theta),
+                   outer_end,
+                   outer_end,
+                   point(handle_radius_s, -handle_theta),
+                   point(handle_radius_s, dtheta - handle_theta)]
+    handle_right = [outer_start,
+                    point(handle_radius_l, dtheta - handle_theta),
+                    point(handle_radius_l, -handle_theta),
+                    outer_end,
+                    outer_end,
+                    point(handle_radius_s, -dtheta + handle_theta),
+                    point(handle_radius_s, handle_theta),
+                    point(inner_radius, dtheta)]
+
+    return np.array(co), np.array(handle_left), np.array(handle_right)
+
+
+## Calculate evenly spaced points on a line segment
+# @param p1 First point of the line segment
+# @param p2 Last point of the line segment
+# @param n_subdiv Number of points. At least two points are returned
+# @return Array of shape (n, 3)
+def line(p1, p2, n_subdiv):
+    n = max(int(n_subdiv), 2)
+    t = np.linspace(0.0, 1.0, n)[:, None]
+    p1 = np.asarray(p1, dtype=np.float64)
+    p2 = np.asarray(p2, dtype=np.float64)
+
+    return p1 + (p2 - p1) * t
+
+
+## Calculate the length of a helix
+# @param radius Radius of the helix
+# @param pitch Number of revolutions per length unit of the helix
+# @param length Axial length of the helix
+# @return The length of the helix
+def helical_length(radius, pitch, length):
+    circ = 2.0 * radius * math.pi * length * pitch
+    return math.sqrt(circ**2 + length**2)
+
+
+## Calculate the radius of curvature of a helix
+# @param radius Radius of the helix
+# @param pitch Number of revolutions per length unit
+# @return The radius of curvature. None if the helix is a straight line
+def helix_curvature_radius(radius, pitch):
+    if abs(radius) < 1e-6 or abs(pitch) < 1e-6:
+        return None
+    b = 1.0 / (2.0 * math.pi * pitch)
+    return (radius**2 + b**2) / radius
+
+
+## Calculate control points and handles of a bezier helix
+# The helix runs from z = length down to z = 0
+# @param length Axial length of the helix
+# @param pitch Number of revolutions per length unit
+# @param radius Radius of the helix
+# @param clockwize Rotation direction of the helix
+# @param start_angle Angle of the first point
+# @return Tuple of (n, 3) arrays (co, handle_left, handle_right)
+def bezier_helix(length, pitch, radius, clockwize, start_angle):
+    if abs(length) < 1e-6:
+        raise InputError("Length is zero")
+
+    n_points = math.floor(length * pitch * 4)
+
+# Need at least 3 points to make a helix
+    if n_points < 3:
+        n_points = 3
+
+    dtheta = (2.0 * math.pi * pitch * length) / (n_points - 1)
+
+    ppr = (2.0 * math.pi) / dtheta
+
+    if clockwize:
+        dtheta = -dtheta
+
+    handle_len = radius * (4.0/3.0) * math.tan(math.pi/(2.0 * ppr))
+
+    handle_radius = math.sqrt(radius**2 + handle_len**2)
+    htheta = math.acos(radius / handle_radius)
+
+    dz = length / (n_points)
+
+    i = np.arange(n_points, dtype=np.float64)
+    z = length - (length * (i / (n_points - 1)))
+    theta = start_angle + dtheta * i
+
+    co = np.empty((n_points, 3))
+    co[:, 0] = radius * np.cos(theta)
+    co[:, 1] = radius * np.sin(theta)
+    co[:, 2] = z
+
+    if clockwize:
+        tmpdz = -(dz / 2.0)
+    else:
+        tmpdz = dz / 2.0
+
+    handle_a = np.empty((n_points, 3))
+    handle_a[:, 0] = handle_radius * np.cos(theta - htheta)
+    handle_a[:, 1] = handle_radius * np.sin(theta - htheta)
+    handle_a[:, 2] = z + tmpdz
+
+    handle_b = np.empty((n_points, 3))
+    handle_b[:, 0] = handle_radius * np.cos(theta + htheta)
+    handle_b[:, 1] = handle_radius * np.sin(theta + htheta)
+    handle_b[:, 2] = z - tmpdz
+
+    if clockwize:
+        return co, handle_b, handle_a
+
+    return co, handle_a, handle_b
+
+
+## Calculate a helical braid strand
+# Every eighth part of the strand is pulled in and out by 1.1 strand radii so
+# that strands running in opposite directions weave over and under each other.
+# @param length Axial length of the helix
+# @param radius Radius of strand position
+# @param pitch Number of revolutions per length unit in helix
+# @param points_per_rev Number of points on helix for each revolution
+# @param strand_radius Radius of the strand
+# @param clockwize Rotation direction of helix
+# @return Tuple of (n, 3) arrays (co, handle_left, handle_right)
+def braid_strand(length, radius, pitch, points_per_rev, strand_radius,
+                 clockwize):
+    # Calculate angle between each point
+    dtheta = (2.0 * math.pi) / points_per_rev
+    if not clockwize:
+        dtheta *= -1
+
+    # Calculate total number of points
+    n_points = math.floor(points_per_rev * pitch * length)
+
+    # Calculate handle offsets
+    handle_radius = math.sqrt(radius**2 + handle_length(radius, dtheta)**2)
+    htheta = math.acos(radius / handle_radius)
+
+    # Calculate z offset for handles
+    dz = (length / (length * pitch * 2 * math.pi)) * htheta
+    if clockwize:
+        dz = -dz
+
+    # Determine if a point is pulled in or out. The pattern starts at a
+    # different offset for each direction
+    i = np.arange(n_points + 1)
+    offs = (i + (1 if clockwize else 5)) % 8
+    dradius = np.zeros(n_points + 1)
+    dradius[offs <= 2] = strand_radius * 1.1
+    dradius[(offs >= 4) & (offs <= 6)] = strand_radius * -1.1
+
+    theta = dtheta * i
+    z = length * (i / float(n_points))
+
+    co = np.empty((n_points + 1, 3))
+    co[:, 0] = (radius + dradius) * np.cos(theta)
+    co[:, 1] = (radius + dradius) * np.sin(theta)
+    co[:, 2] = z
+
+    handle_a = np.empty((n_points + 1, 3))
+    handle_a[:, 0] = (handle_radius + dradius) * np.cos(theta - htheta)
+    handle_a[:, 1] = (handle_radius + dradius) * np.sin(theta - htheta)
+    handle_a[:, 2] = z + dz
+
+    handle_b = np.empty((n_points + 1, 3))
+    handle_b[:, 0] = (handle_radius + dradius) * np.cos(theta + htheta)
+    handle_b[:, 1] = (handle_radius + dradius) * np.sin(theta + htheta)
+    handle_b[:, 2] = z - dz
+
+    if clockwize:
+        return co, handle_a, handle_b
+
+    return co, handle_b, handle_a
+
+
+## Rotate points around the Z-axis
+# @param points Array of shape (..., 3)
+# @param angles Rotation angle, or array of angles broadcast against the
+# leading dimensions of points
+# @return Rotated copy of points
+def rotate_z(points, angles):
+    points = np.asarray(points, dtype=np.float64)
+    angles = np.asarray(angles, dtype=np.float64)
+    c = np.cos(angles)
+    s = np.sin(angles)
+
+    shape = np.broadcast(points[..., 0], angles).shape
+    ret = np.array(np.broadcast_to(points, shape + (3,)))
+    ret[..., 0] = points[..., 0] * c - points[..., 1] * s
+    ret[..., 1] = points[..., 0] * s + points[..., 1] * c
+
+    return ret
+
+
+## Calculate all strands of a braid
+# Each of the 2 * n_bundle_pairs carriers holds bundle_size ends lying side by
+# side. Carriers alternate between clockwise and counter-clockwise strands,
+# whose radius modulation weaves them over and under each other.
+# @param length Axial length of braid
+# @param radius Radius of strand positions
+# @param bundle_size Number of strands in each bundle
+# @param n_bundle_pairs Number of bundles going in each direction
+# @param pitch Number of revolutions per length unit
+# @param strand_radius Radius of each individual strand
+# @return Tuple of (n_strands, n_points, 3) arrays
+# (co, handle_left, handle_right)
+def braid(length, radius, bundle_size, n_bundle_pairs, pitch, strand_radius):
+    n_bundles = int(n_bundle_pairs * 2)
+    bundle_size = int(bundle_size)
+    if n_bundles < 2 or bundle_size < 1:
+        raise InputError("Braid needs at least one bundle pair")
+
+    # Angle between carriers and between the ends of a carrier
+    dtheta = (2.0 * math.pi) / n_bundles
+    strand_dtheta = (2.0 * math.pi) / ((radius * math.pi) / strand_radius)
+
+    # Shape (2, 3, n_points, 3): direction, co/handles, point, xyz
+    base = np.array([
+        braid_strand(length, radius, pitch, n_bundles * 4, strand_radius,
+                     True),
+        braid_strand(length, radius, pitch, n_bundles * 4, strand_radius,
+                     False)])
+
+    # Ends are ordered end by end, first all clockwise then all
+    # counter-clockwise carriers. Shape (bundle_size, 2, n_bundles)
+    angles = (strand_dtheta * np.arange(bundle_size))[:, None, None] + \
+        np.array([0.0, dtheta / 2.0])[None, :, None] + \
+        (dtheta * np.arange(n_bundles))[None, None, :]
+
+    # Shape (bundle_size, 2, n_bundles, 3, n_points, 3)
+    strands = rotate_z(base[None, :, None, :, :, :],
+                       angles[:, :, :, None, None])
+    strands = strands.reshape((-1,) + base.shape[1:])
+
+    return strands[:, 0], strands[:, 1], strands[:, 2]
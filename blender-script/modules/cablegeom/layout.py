@@ -0,0 +1,128 @@
+## @package cablegeom.layout
+# Ring packing of round strands inside a round conductor.
+
+import collections
+import math
+import numpy as np
+
+## Resolution of the radii used as cache keys
+QUANTUM = 1e-9
+
+## Layout of strand rings, outermost ring first
+# radii: Radius of each ring. A centred strand is a ring with radius 0
+# counts: Number of strands in each ring
+# angles: Angle of every strand, ring after ring
+# offsets: Index of the first angle of each ring
+RingLayout = collections.namedtuple('RingLayout',
+                                    ['radii', 'counts', 'angles', 'offsets'])
+
+_layouts = {}
+_stats = {'hits': 0, 'misses': 0}
+
+
+## Quantize a radius to be used in a cache key
+# @param value The radius
+# @return Integer number of quanta
+def quantize(value):
+    return int(round(value / QUANTUM))
+
+
+## Circle packing algorithm
+# @param rc Radius of the outermost ring of strand centres
+# @param rs Radius of the strands
+# @return A RingLayout
+def solve_layout(rc, rs):
+    radii = []
+    counts = []
+    angles = []
+
+    while True:
+        no = int(math.floor((2.0 * math.pi * rc) / (2.0 * rs)))
+        if no > 0:
+            x0 = rc * math.cos(0 * 2 * math.pi / no)
+            y0 = rc * math.sin(0 * 2 * math.pi / no)
+            x1 = rc * math.cos(1 * 2 * math.pi / no)
+            y1 = rc * math.sin(1 * 2 * math.pi / no)
+            dist = math.sqrt((x0 - x1)**2 + (y0 - y1)**2)
+
+            if dist < 2.0 * rs:
+                no -= 1
+
+        if no > 0:
+            radii.append(rc)
+            counts.append(no)
+            angles.append(np.arange(no) * 2 * math.pi / no)
+
+        rc_next = rc - (2.0 * rs)
+        if rc_next < rs:
+            if rc > 2.0 * rs or not counts:
+                radii.append(0.0)
+                counts.append(1)
+                angles.append(np.zeros(1))
+            break
+        else:
+            rc = rc_next
+
+    counts = np.array(counts, dtype=np.int32)
+    offsets = np.zeros(len(counts), dtype=np.int32)
+    np.cumsum(counts[:-1], out=offsets[1:])
+
+    layout = RingLayout(radii=np.array(radii), counts=counts,
+                        angles=np.concatenate(angles), offsets=offsets)
+    for a in layout:
+        a.setflags(write=False)
+
+    return layout
+
+
+## Memoized version of solve_layout
+# Radii are quantized to QUANTUM so that parts sharing a strand size share
+# the same layout.
+# @param rc Radius of the outermost ring of strand centres
+# @param rs Radius of the strands
+# @return A read only RingLayout
+def ring_layout(rc, rs):
+    key = (quantize(rc), quantize(rs))
+    layout = _layouts.get(key)
+    if layout is None:
+        _stats['misses'] += 1
+        layout = solve_layout(key[0] * QUANTUM, key[1] * QUANTUM)
+        _layouts[key] = layout
+    else:
+        _stats['hits'] += 1
+
+    return layout
+
+
+## Split the angles of a layout into one array per ring
+# @param layout A RingLayout
+# @return List of angle arrays
+def ring_angles(layout):
+    return np.split(layout.angles, layout.offsets[1:])
+
+
+## Calculate strand centre points of a layout
+# @param layout A RingLayout
+# @return A list of rings, each a list of (x, y) tuples
+def positions(layout):
+    ret = []
+    for r, angles in zip(layout.radii, ring_angles(layout)):
+        xs = r * np.cos(angles)
+        ys = r * np.sin(angles)
+        ret.append(list(zip(xs.tolist(), ys.tolist())))
+
+    return ret
+
+
+## Cache statistics
+# @return Dictionary with number of hits, misses and cached layouts
+def cache_info():
+    return {'hits': _stats['hits'], 'misses': _stats['misses'],
+            'size': len(_layouts)}
+
+
+## Forget all cached layouts
+def clear_cache():
+    _layouts.clear()
+    _stats['hits'] = 0
+    _stats['misses'] = 0
@@ -0,0 +1,269 @@
+## @package cablegeom.mesh
+# Vertex and polygon arrays of mesh primitives.
+# Generators return a tuple of (verts, loops, loop_totals) where verts is an
+# (n, 3) array of positions, loops the vertex indices of all polygons one after
+# the other and loop_totals the number of vertices of each polygon.
+
+import math
+import numpy as np
+from cablegeom import InputError
+from cablegeom.tessellation import CHORD_ERROR, chord_segments, arc_segments
+
+
+## Calculate faces for a strand made of stacked vertex circles
+# Vertex j on circle i has index i * ppr + j. Faces are ordered as the strands
+# used to be built: first cap, side faces circle by circle, last cap.
+#
+# @param n_circles Number of circles after the first one
+# @param ppr Points per circle
+# @param roll Rotate the loop order of regular side faces one step
+# @return Tuple of (loops, loop_totals)
+def strand_faces(n_circles, ppr, roll=False):
+    i = np.arange(1, n_circles + 1)[:, None]
+    j = np.arange(1, ppr)[None, :]
+
+    # Side faces between point j - 1 and j
+    sides = np.stack((i * ppr + j, (i - 1) * ppr + j, (i - 1) * ppr + j - 1,
+                      i * ppr + j - 1), axis=-1)
+    if roll:
+        sides = np.roll(sides, 1, axis=-1)
+
+    # Last side face closing each circle
+    i = i[:, 0]
+    last = np.stack((i * ppr, i * ppr + ppr - 1, (i - 1) * ppr + ppr - 1,
+                     (i - 1) * ppr), axis=-1)
+
+    sides = np.concatenate((sides, last[:, None, :]), axis=1).ravel()
+
+    # Cap faces on first and last circle
+    first_cap = np.arange(ppr - 1, -1, -1)
+    last_cap = first_cap + n_circles * ppr
+
+    loops = np.concatenate((first_cap, sides, last_cap))
+    loop_totals = np.full(n_circles * ppr + 2, 4, dtype=np.int32)
+    loop_totals[0] = loop_totals[-1] = ppr
+
+    return loops, loop_totals
+
+
+## Calculate a cylindrical strand mesh
+#
+# @param length Axial length of the cylinder
+# @param radius Radius of the cylinder
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the axis will be bent to, or None if
+# it stays straight
+# @return Tuple of (verts, loops, loop_totals)
+def straight_strand(length, radius, chord_error=CHORD_ERROR,
+                    axial_radius=None):
+    ppr = chord_segments(radius, chord_error)
+    n_circles = arc_segments(length, axial_radius, chord_error)
+    dz = length / n_circles
+    dtheta = (2.0 * math.pi) / ppr
+
+    theta = np.arange(ppr) * dtheta
+    verts = np.empty((n_circles + 1, ppr, 3))
+    verts[:, :, 0] = radius * np.sin(theta)
+    verts[:, :, 1] = radius * np.cos(theta)
+    verts[:, :, 2] = dz * np.arange(n_circles + 1)[:, None]
+
+    loops, loop_totals = strand_faces(n_circles, ppr)
+
+    return verts.reshape(-1, 3), loops, loop_totals
+
+
+## Calculate a single twisted strand mesh
+#
+# @param length Axial length of the strand
+# @param radius Radius of strand position
+# @param pitch Revolutions per length unit
+# @param strand_radius Radius of the strand
+# @param start_angle Angle of strand position
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the conductor axis will be bent to,
+# or None if it stays straight
+# @return Tuple of (verts, loops, loop_totals)
+def bunched_strand(length,
+                   radius,
+                   pitch,
+                   strand_radius,
+                   start_angle=0.0,
+                   chord_error=CHORD_ERROR,
+                   axial_radius=None):
+    ppr = chord_segments(strand_radius, chord_error) # Points per revolution
+    cpr = math.floor((pitch / 0.05) * (radius / 0.005)) # Circles per revolution
+    if cpr < 10:
+        cpr = 10
+    elif cpr > 80:
+        cpr = 80
+
+    # Total rotation of the strand around the conductor axis
+    n_steps = max(1, math.floor(cpr * length * pitch))
+    twist = n_steps * ((2.0 * math.pi) / (pitch * cpr)) * 8
+
+    # Derive the number of circles from the curvature of the outer edge of the
+    # strand helix
+    outer_radius = radius + strand_radius
+    lead = length / twist  # Axial distance per radian
+    curvature = outer_radius / (outer_radius**2 + lead**2)
+    if axial_radius is not None:
+        curvature += 1.0 / axial_radius
+    arc_length = twist * math.sqrt(outer_radius**2 + lead**2)
+    n_circles = arc_segments(arc_length, 1.0 / curvature, chord_error)
+
+    dtheta_cp = (2.0 * math.pi) / ppr  # Angle between circle points
+    theta_x = math.atan((
+        (length / pitch) / 2) / radius)  # Angle to rotate circle along x-axis
+    dtheta_z = twist / n_circles  # Angle to rotate circle around origin
+
+    dz = length / n_circles  # Z distance between circles
+
+    # Points on circle
+    theta = np.arange(ppr) * dtheta_cp
+    x = strand_radius * np.sin(theta) + radius
+    y = strand_radius * np.cos(theta)
+
+    # Rotate circle around origin
+    pr = np.sqrt(x**2 + y**2)
+    ptheta = np.arctan(y / x)
+    j = np.arange(n_circles + 1)[:, None]
+    phi = j * dtheta_z - ptheta - start_angle
+
+    verts = np.empty((n_circles + 1, ppr, 3))
+    verts[:, :, 0] = pr * np.sin(phi)
+    verts[:, :, 1] = pr * np.cos(phi)
+    verts[:, :, 2] = (dz * j) + (y * math.cos(theta_x))
+
+    loops, loop_totals = strand_faces(n_circles, ppr, roll=True)
+
+    return verts.reshape(-1, 3), loops, loop_totals
+
+
+## Concatenate several sets of mesh arrays into one
+# @param parts Sequence of (verts, loops, loop_totals) tuples
+# @return Tuple of (verts, loops, loop_totals) with offset vertex indices
+def join(parts):
+    verts = []
+    loops = []
+    loop_totals = []
+    offset = 0
+    for v, l, t in parts:
+        verts.append(v)
+        loops.append(np.asarray(l) + offset)
+        loop_totals.append(t)
+        offset += len(v)
+
+    return (np.concatenate(verts), np.concatenate(loops),
+            np.concatenate(loop_totals))
+
+
+## Calculate a thick walled tube
+# Vertex 4 * i + k is point i on the outer bottom (k = 0), outer top (1),
+# inner bottom (2) and inner top (3) circle.
+#
+# @param outer_radius Outer radius of tube
+# @param inner_radius Inner radius of tube
+# @param length Length of the tube in Z-axis
+# @param chord_error Largest distance between the mesh and a true cylinder
+# @return Tuple of (verts, loops, loop_totals)
+def tube(outer_radius, inner_radius, length, chord_error=CHORD_ERROR):
+    if inner_radius >= outer_radius:
+        raise InputError("Inner radius too big")
+    elif outer_radius <= 0.0:
+        raise InputError("Outer radius too small")
+
+    # Calculate points per revolution
+    ppr = chord_segments(outer_radius, chord_error, multiple=4)
+
+    theta = np.arange(ppr) * ((2.0 * math.pi) / ppr)
+    radii = np.array((outer_radius, outer_radius, inner_radius, inner_radius))
+    verts = np.empty((ppr, 4, 3))
+    verts[:, :, 0] = np.sin(theta)[:, None] * radii
+    verts[:, :, 1] = np.cos(theta)[:, None] * radii
+    verts[:, :, 2] = (0.0, length, 0.0, length)
+
+    # Faces between point i - 1 and i. The last four close the tube
+    offs = 4 * np.append(np.arange(1, ppr), 0)[:, None]
+    prev = 4 * np.append(np.arange(ppr - 1), ppr - 1)[:, None]
+    faces = np.empty((ppr, 4, 4), dtype=np.int64)
+    faces[:, 0] = np.hstack((offs + 0, prev + 0, prev + 1, offs + 1))
+    faces[:, 1] = np.hstack((offs + 2, prev + 2, prev + 3, offs + 3))
+    faces[:, 2] = np.hstack((offs + 0, offs + 2, prev + 2, prev + 0))
+    faces[:, 3] = np.hstack((offs + 1, offs + 3, prev + 3, prev + 1))
+
+    return (verts.reshape(-1, 3), faces.ravel(),
+            np.full(ppr * 4, 4, dtype=np.int32))
+
+
+## Calculate a shell tube with zero thickness
+# Vertex 2 * i is point i on the bottom circle and 2 * i + 1 on the top circle.
+#
+# @param length Length of the tube
+# @param radius Radius of the tube
+# @param chord_error Largest distance between the mesh and a true cylinder
+# @return Tuple of (verts, loops, loop_totals)
+def shell_tube(length, radius, chord_error=CHORD_ERROR):
+    ppr = chord_segments(radius, chord_error, multiple=4)
+
+    theta = np.arange(ppr) * ((2.0 * math.pi) / ppr)
+    verts = np.empty((ppr, 2, 3))
+    verts[:, :, 0] = radius * np.sin(theta)[:, None]
+    verts[:, :, 1] = radius * np.cos(theta)[:, None]
+    verts[:, :, 2] = (0.0, length)
+
+    # Faces between point i and i + 1. The last one closes the tube
+    i = 2 * np.arange(ppr - 1)[:, None]
+    faces = np.vstack((np.hstack((i, i + 1, i + 3, i + 2)),
+                       (0, 2 * ppr - 2, 2 * ppr - 1, 1)))
+
+    return (verts.reshape(-1, 3), faces.ravel(),
+            np.full(ppr, 4, dtype=np.int32))
+
+
+## Bend vertices of a straight mesh along a helix
+# Local Z is the distance along the helix, which runs from z = length down to
+# z = 0 like cablegeom.curves.bezier_helix. Local X and Y are placed in a
+# rotation minimizing frame that starts with X pointing away from the axis.
+#
+# @param verts Array of shape (n, 3). Z ranges from 0 to the helical length
+# @param length Axial length of the helix
+# @param pitch Number of revolutions per length unit
+# @param radius Radius of the helix
+# @param clockwize Rotation direction of the helix
+# @param start_angle Angle of the first point of the helix
+# @return Array of shape (n, 3)
+def helix_deform(verts, length, pitch, radius, clockwize, start_angle=0.0):
+    if abs(length) < 1e-6:
+        raise InputError("Length is zero")
+
+    verts = np.asarray(verts, dtype=np.float64).reshape(-1, 3)
+    x = verts[:, 0:1]
+    y = verts[:, 1:2]
+    s = verts[:, 2]
+
+    # Angular and axial rate per unit of helical length
+    helical_length = math.sqrt((2.0 * math.pi * radius * pitch * length)**2 +
+                               length**2)
+    k = (2.0 * math.pi * pitch * length) / helical_length
+    if clockwize:
+        k = -k
+    c = length / helical_length
+
+    theta = start_angle + k * s
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+
+    # Radial direction and its cross product with the tangent
+    u = np.stack((cos_theta, sin_theta, np.zeros_like(s)), axis=-1)
+    v = np.stack((c * sin_theta, -c * cos_theta,
+                  np.full_like(s, -radius * k)), axis=-1)
+
+    # The frame turns with the torsion of the helix to keep it from twisting
+    alpha = (k * c * s)[:, None]
+    r1 = np.cos(alpha) * u + np.sin(alpha) * v
+    r2 = np.cos(alpha) * v - np.sin(alpha) * u
+
+    ret = radius * u + x * r1 + y * r2
+    ret[:, 2] += length - c * s
+
+    return ret
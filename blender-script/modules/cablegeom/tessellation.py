@@ -0,0 +1,52 @@
+## @package cablegeom.tessellation
+# Segment counts derived from a chord error tolerance.
+
+import math
+from cablegeom import InputError
+
+## Default largest distance between a tessellated surface and the true
+# surface, in length units
+CHORD_ERROR = 0.00005
+
+## Fewest segments used for a tessellated circle
+MIN_SEGMENTS = 6
+
+
+## Calculate the number of segments of a circle
+# The sagitta of each segment is radius * (1 - cos(pi / n))
+#
+# @param radius Radius of the circle
+# @param chord_error Largest allowed sagitta
+# @param min_segments Fewest number of segments
+# @param multiple Round the number of segments up to a multiple of this
+# @return Number of segments
+def chord_segments(radius, chord_error=CHORD_ERROR, min_segments=MIN_SEGMENTS,
+                   multiple=1):
+    if chord_error <= 0.0:
+        raise InputError("Chord error must be positive")
+
+    if chord_error >= radius:
+        n = min_segments
+    else:
+        n = int(math.ceil(math.pi / math.acos(1.0 - chord_error / radius)))
+        n = max(n, min_segments)
+
+    return int(math.ceil(n / float(multiple))) * multiple
+
+
+## Calculate the number of segments along a curved path
+#
+# @param arc_length Length of the path
+# @param curvature_radius Radius of curvature of the path. None if straight
+# @param chord_error Largest allowed sagitta
+# @return Number of segments
+def arc_segments(arc_length, curvature_radius, chord_error=CHORD_ERROR):
+    if curvature_radius is None:
+        return 1
+
+    if chord_error >= curvature_radius:
+        dphi = math.pi
+    else:
+        dphi = 2.0 * math.acos(1.0 - chord_error / curvature_radius)
+
+    return max(1, int(math.ceil(arc_length / (curvature_radius * dphi))))
@@ -2,24 +2,138 @@
 # This package contains material stuff for cabletools
 import bpy
 import os
+import rco
+import tracing
+
+## Names of the materials created by this module keyed by (kind, colour,
+# object_radius). Names are stored instead of the materials, since a reference
+# to a removed material points to freed memory.
+_materials = {}
+_registry_stats = {'hits': 0, 'misses': 0}
+
+## Custom property holding the registry key of a material. Tells a registered
+# material from a later one that was given the same name.
+KEY_PROPERTY = 'ct_material_key'
+
+
+## 
+# @brief Look up a previously created material
+# 
+# @param key Tuple of (material kind, colour, object_radius)
+# 
+# @return The material or None if it does not exist any more
+def find_material(key):
+    name = _materials.get(key)
+    if name is not None:
+        material = bpy.data.materials.get(name)
+        if material is not None and material.get(KEY_PROPERTY) == repr(key):
+            _registry_stats['hits'] += 1
+            return material
+        # Material has been removed or renamed
+        del _materials[key]
+
+    _registry_stats['misses'] += 1
+    return None
+
+
+## 
+# @brief Remember a created material so it can be reused
+# 
+# @param key Tuple of (material kind, colour, object_radius)
+# @param material The material
+def register_material(key, material):
+    material[KEY_PROPERTY] = repr(key)
+    _materials[key] = material.name
+
+
+## 
+# @brief Hit and miss counts of the material registry
+# 
+# @return Dictionary with hits, misses and number of registered materials
+def material_registry_stats():
+    return {'hits': _registry_stats['hits'],
+            'misses': _registry_stats['misses'],
+            'size': len(_materials)}
+
+
+## 
+# @brief Forget all registered materials and reset the counters
+def clear_material_registry():
+    _materials.clear()
+    _registry_stats['hits'] = 0
+    _registry_stats['misses'] = 0
+
+
+## Folder containing the material library
+LIBRARY_FOLDER = os.path.dirname(__file__) + "/../../blender-materials/"
+
+## Filename of the material library
+LIBRARY_FILENAME = "cabletools.blend"
+
+## Link node groups from the library instead of appending them
+LINK_LIBRARY = False
+
+## Node groups used by the materials in this module
+NODE_GROUPS = ('plastic_pvc', 'plastic_pe', 'plastic_ldpe', 'plastic_pur',
+               'plastic_epd', 'plastic_fill', 'plastic_fill_rope',
+               'metal_copper', 'metal_tin', 'metal_aluminum', 'metal_iron',
+               'metal_iron_zinc', 'lap_nylon', 'lap_chrome-2-sided',
+               'lap_plastic')
+
+# Node groups that were not found in the library
+_unavailable = set()
+
+
+## 
+# @brief Load all missing node groups from a blendfile in one pass
+# 
+# @param names Names of the node groups to load
+# @param folder_path Path to folder containing the blendfile
+# @param filename Filename
+# @param link Link the node groups instead of appending. Defaults to
+# LINK_LIBRARY
+# 
+# @return List of names of the loaded node groups
+def load_nodegroups(names=NODE_GROUPS, folder_path=LIBRARY_FOLDER,
+                    filename=LIBRARY_FILENAME, link=None):
+    if link is None:
+        link = LINK_LIBRARY
+
+    missing = [n for n in names
+               if n not in bpy.data.node_groups and n not in _unavailable]
+    if not missing:
+        return []
+
+    with bpy.data.libraries.load(folder_path + filename,
+                                 link=link) as (data_from, data_to):
+        available = set(data_from.node_groups)
+        data_to.node_groups = [n for n in missing if n in available]
+
+    _unavailable.update(n for n in missing if n not in available)
+
+    return [n for n in missing if n in available]
 
 
 ## 
-# @brief Append material node group from blendfile
+# @brief Make sure a material node group is loaded from blendfile
+# All other missing node groups of the library are loaded in the same pass,
+# so the file is only read once.
 # 
 # @param folder_path Path to folder containing the blendfile
 # @param filename Filename
 # @param obj_name Name of the nodegroup in file
-def append_nodegroup(
-        folder_path=os.path.dirname(__file__) + "/../../blender-materials/",
-        filename="cabletools.blend",
-        obj_name="plastic_pvc"):
-    obj_type = "NodeTree"
-    # tip object_full_directory_path as str: "./materials.blend\\NodeTree\\"
-    object_full_directory_path = folder_path + filename + "\\" + obj_type + "\\"
+# @param link Link the node group instead of appending. Defaults to
+# LINK_LIBRARY
+def append_nodegroup(folder_path=LIBRARY_FOLDER, filename=LIBRARY_FILENAME,
+                     obj_name="plastic_pvc", link=None):
+    if obj_name in bpy.data.node_groups:
+        return
 
-    bpy.ops.wm.append(
-        directory=object_full_directory_path, filename=obj_name, link=False)
+    names = list(NODE_GROUPS)
+    if obj_name not in names:
+        names.append(obj_name)
+
+    load_nodegroups(names, folder_path, filename, link)
 
 
 ## 
@@ -34,6 +148,12 @@ def append_nodegroup(
 # @return The material
 def insulator_material(color, material_name, material_node_group_name,
                        object_radius):
+    key = ((material_name, material_node_group_name), tuple(color),
+           object_radius)
+    material = find_material(key)
+    if material is not None:
+        return material
+
     #Append material
     append_nodegroup(obj_name=material_node_group_name)
 
@@ -68,6 +188,8 @@ def insulator_material(color, material_name, material_node_group_name,
         material.node_tree.links.new(material_output.inputs['Displacement'],
                                  nodegroup.outputs['Displacement'])    
 
+    register_material(key, material)
+
     return material
 
 
@@ -162,6 +284,11 @@ def fill_rope_material(color, object_radius=0.001):
 
 
 def conductor_material(material_name, material_node_group_name):
+    key = ((material_name, material_node_group_name), None, None)
+    material = find_material(key)
+    if material is not None:
+        return material
+
     #Append material
     append_nodegroup(obj_name=material_node_group_name)
 
@@ -196,6 +323,8 @@ def conductor_material(material_name, material_node_group_name):
     #set viewport color
     #material.diffuse_color = base_color
 
+    register_material(key, material)
+
     return material
 
 
@@ -229,6 +358,11 @@ def iron_zinc_conductor_material():
 
 
 def lap_material(material_name, material_node_group_name, object_radius):
+    key = ((material_name, material_node_group_name), None, object_radius)
+    material = find_material(key)
+    if material is not None:
+        return material
+
     #Append material
     append_nodegroup(obj_name=material_node_group_name)
 
@@ -261,6 +395,8 @@ def lap_material(material_name, material_node_group_name, object_radius):
         material.node_tree.links.new(material_output.inputs['Displacement'],
                                  nodegroup.outputs['Displacement'])    
 
+    register_material(key, material)
+
     return material
 
 
@@ -285,6 +421,13 @@ def plastic_lap_material(object_radius=0.001):
     return material
 
 
+# Track and trace the material functions before they are put in the lookup
+# tables
+rco.track(globals(), exclude=('find_material', 'register_material',
+                              'material_registry_stats',
+                              'clear_material_registry'))
+tracing.instrument(globals())
+
 INSULATOR_MATERIALS = {'pvc': pvc_insulator_material,
                        'pe': pe_insulator_material,
                        'ldpe': ldpe_insulator_material,
@@ -1,11 +1,17 @@
 ## @package cabletools
 # This package contains functions to create cable related objects in blender.
 
-import bmesh
 import bpy
+import cablegeom
+import cablegeom.curves
+import cablegeom.mesh
 import cablematerials as cm
+import geometrycache
+import lod
 import math
+import numpy as np
 import rco
+import tracing
 
 CONDUCTOR_MATERIALS = [('cu', 'CU', 'Standard copper'),
                        ('cu-t', 'CU-Tinned', 'Tinned copper'),
@@ -38,91 +44,9 @@ def make_tube_section_slice_data(outer_radius, inner_radius, amount,
     polyline = curveData.splines.new('BEZIER')
     polyline.use_cyclic_u = True
     polyline.bezier_points.add(7)
-
-    theta = 2.0 * math.pi * amount
-    dtheta = theta / 2.0
-
-    handle_length_l = (4.0 / 3.0) * math.tan(math.pi / (2.0 * (
-        (2.0 * math.pi) / dtheta))) * outer_radius
-    handle_radius_l = math.sqrt(outer_radius**2 + handle_length_l**2)
-    handle_length_s = (4.0 / 3.0) * math.tan(math.pi / (2.0 * (
-        (2.0 * math.pi) / dtheta))) * inner_radius
-    handle_radius_s = math.sqrt(inner_radius**2 + handle_length_s**2)
-    handle_theta = math.acos(outer_radius / handle_radius_l)
-
-    polyline.bezier_points[0].co[0] = outer_radius * math.cos(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[0].co[1] = outer_radius * math.sin(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[0].handle_left = polyline.bezier_points[0].co
-    polyline.bezier_points[0].handle_right = polyline.bezier_points[0].co
-
-    polyline.bezier_points[1].co[0] = outer_radius * math.cos(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[1].co[1] = outer_radius * math.sin(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[1].handle_left = polyline.bezier_points[1].co
-    polyline.bezier_points[1].handle_right[0] = handle_radius_l * math.cos(
-        dtheta - handle_theta + start_angle)
-    polyline.bezier_points[1].handle_right[1] = handle_radius_l * math.sin(
-        dtheta - handle_theta + start_angle)
-
-    polyline.bezier_points[2].co[0] = outer_radius * math.cos(start_angle)
-    polyline.bezier_points[2].co[1] = outer_radius * math.sin(start_angle)
-    polyline.bezier_points[2].handle_left[0] = handle_radius_l * math.cos(
-        handle_theta + start_angle)
-    polyline.bezier_points[2].handle_left[1] = handle_radius_l * math.sin(
-        handle_theta + start_angle)
-    polyline.bezier_points[2].handle_right[0] = handle_radius_l * math.cos(
-        -handle_theta + start_angle)
-    polyline.bezier_points[2].handle_right[1] = handle_radius_l * math.sin(
-        -handle_theta + start_angle)
-
-    polyline.bezier_points[3].co[0] = outer_radius * math.cos(-dtheta +
-                                                              start_angle)
-    polyline.bezier_points[3].co[1] = outer_radius * math.sin(-dtheta +
-                                                              start_angle)
-    polyline.bezier_points[3].handle_right = polyline.bezier_points[3].co
-    polyline.bezier_points[3].handle_left[0] = handle_radius_l * math.cos(
-        -dtheta + handle_theta + start_angle)
-    polyline.bezier_points[3].handle_left[1] = handle_radius_l * math.sin(
-        -dtheta + handle_theta + start_angle)
-
-    polyline.bezier_points[4].co = polyline.bezier_points[3].co
-    polyline.bezier_points[4].handle_right = polyline.bezier_points[3].co
-    polyline.bezier_points[4].handle_left = polyline.bezier_points[3].co
-
-
-    polyline.bezier_points[5].co[0] = inner_radius * math.cos(-dtheta +
-                                                              start_angle)
-    polyline.bezier_points[5].co[1] = inner_radius * math.sin(-dtheta +
-                                                              start_angle)
-    polyline.bezier_points[5].handle_left = polyline.bezier_points[4].co
-    polyline.bezier_points[5].handle_right[0] = handle_radius_s * math.cos(
-        -dtheta + handle_theta + start_angle)
-    polyline.bezier_points[5].handle_right[1] = handle_radius_s * math.sin(
-        -dtheta + handle_theta + start_angle)
-
-    polyline.bezier_points[6].co[0] = inner_radius * math.cos(start_angle)
-    polyline.bezier_points[6].co[1] = inner_radius * math.sin(start_angle)
-    polyline.bezier_points[6].handle_left[0] = handle_radius_s * math.cos(
-        -handle_theta + start_angle)
-    polyline.bezier_points[6].handle_left[1] = handle_radius_s * math.sin(
-        -handle_theta + start_angle)
-    polyline.bezier_points[6].handle_right[0] = handle_radius_s * math.cos(
-        handle_theta + start_angle)
-    polyline.bezier_points[6].handle_right[1] = handle_radius_s * math.sin(
-        handle_theta + start_angle)
-
-    polyline.bezier_points[7].co[0] = inner_radius * math.cos(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[7].co[1] = inner_radius * math.sin(dtheta +
-                                                              start_angle)
-    polyline.bezier_points[7].handle_right = polyline.bezier_points[7].co
-    polyline.bezier_points[7].handle_left[0] = handle_radius_s * math.cos(
-        dtheta - handle_theta + start_angle)
-    polyline.bezier_points[7].handle_left[1] = handle_radius_s * math.sin(
-        dtheta - handle_theta + start_angle)
+    arrays = cablegeom.curves.tube_section_slice(outer_radius, inner_radius,
+                                                 amount, start_angle)
+    rco.bezier_points_from_arrays(polyline, *arrays)
 
     return polyline
 
@@ -136,6 +60,7 @@ def make_tube_section_slice_data(outer_radius, inner_radius, amount,
 # @param context
 # 
 # @return 
+@lod.controlled
 def make_tube_section_slice(outer_radius, inner_radius, amount, start_angle,
                             context):
     curveData = bpy.data.curves.new('StripedTubeSection', type='CURVE')
@@ -164,6 +89,7 @@ def make_tube_section_slice(outer_radius, inner_radius, amount, start_angle,
 # @param context
 # 
 # @return 
+@lod.controlled
 def make_striped_tube_section(outer_radius, inner_radius, amount, double_sided,
                               context):
     if amount > 0.51 or amount < 0.1:
@@ -217,6 +143,7 @@ def make_striped_tube_section(outer_radius, inner_radius, amount, double_sided,
 # @param length Length of the part/cable in Z-axis
 # @param peel_length How much of the conductor that is visible        
 # @return The new object
+@lod.controlled
 def make_insulator(inner_radius, outer_radius, length, peel_length, material,
                    color_name, context):
     print(inner_radius)
@@ -269,49 +196,54 @@ def make_insulator(inner_radius, outer_radius, length, peel_length, material,
     return line
 
 
+## Replace the materials of an insulator made by make_insulator
+# The colour must have the same profile as the one the insulator was made
+# with: a solid colour or the same kind of stripe
+# @param insulator The insulator object
+# @param material String representing the name of insulator material
+# @param color_name Name of a colour or stripe type
+# @param outer_radius The outer radius of plastic tube
+def set_insulator_material(insulator, material, color_name, outer_radius):
+    if color_name in cm.INSULATOR_COLORS.keys():
+        insulator.active_material = cm.INSULATOR_MATERIALS[material](
+            cm.INSULATOR_COLORS[color_name], outer_radius)
+    elif color_name in cm.STRIPE_TYPES.keys():
+        base_color, stripe_color = cm.STRIPE_TYPES[color_name][:2]
+        insulator.active_material = cm.INSULATOR_MATERIALS[material](
+            base_color, outer_radius)
+        # The visible child is the stripe, the hidden one the base profile
+        for child in insulator.children:
+            if not child.hide:
+                child.active_material = cm.INSULATOR_MATERIALS[material](
+                    stripe_color, outer_radius)
+    else:
+        raise rco.InputError("\"%s\" is not a valid colour:" % color_name)
+
+
+## Profile shape of an insulator colour
+# Colours with the same shape only differ in material
+# @param color_name Name of a colour or stripe type
+# @return None for solid colours, else (amount, double_sided) of the stripe
+def insulator_shape(color_name):
+    if color_name in cm.STRIPE_TYPES.keys():
+        return tuple(cm.STRIPE_TYPES[color_name][2:4])
+    return None
+
+
 ## Circle packing algorithm
-# @param conductor_radius Radius of the larger circle
+# @param conductor_radius Radius of the outermost ring of strand centres
 # @param strand_radius Radius of the smaller circle
-# @return A list of tuples representing the points
+# @return A list of rings, each a list of tuples representing the points
 def strand_positions(conductor_radius, strand_radius):
-    rc = conductor_radius
-    rs = strand_radius
-    ret = []
-
-    while True:
-        no = int(math.floor((2.0 * math.pi * rc) / (2.0 * rs)))
-        ps = []
-        x0 = rc * math.cos(0 * 2 * math.pi / no)
-        y0 = rc * math.sin(0 * 2 * math.pi / no)
-        x1 = rc * math.cos(1 * 2 * math.pi / no)
-        y1 = rc * math.sin(1 * 2 * math.pi / no)
-        dist = math.sqrt((x0 - x1)**2 + (y0 - y1)**2)
-
-        if dist < 2.0 * rs:
-            no -= 1
-
-        for i in range(0, no):
-            x = rc * math.cos(i * 2 * math.pi / no)
-            y = rc * math.sin(i * 2 * math.pi / no)
-            ps.append((x, y))
-
-        ret.append(ps)
-
-        rc_next = rc - (2.0 * rs)
-        if rc_next < rs:
-            if rc > 2.0 * rs:
-                ret.append([(0, 0)])
-            break
-        else:
-            rc = rc_next
-
-    return ret
+    return cablegeom.layout.positions(
+        cablegeom.layout.ring_layout(conductor_radius, strand_radius))
 
 
 ## Creates a single conductor core in the scene
 # @param length Total length of the conductor in Z-axis
 # @param radius Radius of the conductor
 # @return The new object
+@lod.controlled
 def make_solid_conductor(length, radius, context):
     circle = rco.make_bezier_circle(radius, context)
 
@@ -336,30 +268,30 @@ def make_solid_conductor(length, radius, context):
 # @param pitch Number of revolutions per length unit
 # @param strand_radius Radius of individual strands in the conductor
 # @param context Context in wich to create the conductor
-# @return The conductor object
+# @param instanced Keep one strand curve per ring and link the other strands
+# to it instead of joining all strands
+# @return The conductor object. An empty parent of the strands if instanced
+@lod.controlled
 def make_stranded_conductor(length, conductor_radius, pitch, strand_radius,
-                            clockwize, context):
-    #Create a list of points corresponding to the strand positions
-    points = strand_positions(conductor_radius - strand_radius, strand_radius)
+                            clockwize, context, instanced=False):
+    #Calculate the strand layout
+    layout = cablegeom.layout.ring_layout(conductor_radius - strand_radius,
+                                      strand_radius)
 
     #Create a circle to be used as a bevel object
     circle = rco.make_bezier_circle(strand_radius, context)
 
     #Create progress indicator
     wm = bpy.context.window_manager
-    wm.progress_begin(0, len(points))
+    wm.progress_begin(0, len(layout.angles))
     progress = 0
 
     strands = []
     orig_obj = None
 
-    # iterate over the points and calculate positions of conductor helices
-    for row in points:
-        r = math.sqrt(row[0][0]**2 + row[0][1]**2)
-        dtheta = (2.0 * math.pi) / len(row)
-        theta = 0.0
-
-        for i in range(len(row)):
+    # iterate over the rings and calculate positions of conductor helices
+    for r, angles in zip(layout.radii, cablegeom.layout.ring_angles(layout)):
+        for i, theta in enumerate(angles):
             # Use make_solid_conductor for centred strand
             if rco.about_eq(r, 0.0):
                 strands.append(
@@ -396,12 +328,15 @@ def make_stranded_conductor(length, conductor_radius, pitch, strand_radius,
             progress += 1
             wm.progress_update(progress)
 
-            # Calculate next angle
-            theta += dtheta
-
-            # Join strands
-    ret = rco.join_objects(strands, context)
-    ret.name = "Conductor"
+    if instanced:
+        # Parent the linked strands to an empty instead of joining them
+        ret = bpy.data.objects.new("Conductor", None)
+        context.scene.objects.link(ret)
+        for strand in strands:
+            strand.parent = ret
+    else:
+        ret = rco.join_objects(strands, context)
+        ret.name = "Conductor"
     circle.parent = ret
     circle.hide = True
 
@@ -410,15 +345,50 @@ def make_stranded_conductor(length, conductor_radius, pitch, strand_radius,
     return ret
 
 
+## Assign a material to the first slot of an object instead of its data
+# Used for objects with linked or shared data
+# @param obj The object
+# @param material The material
+def set_object_material(obj, material):
+    if len(obj.material_slots) == 0:
+        obj.data.materials.append(None)
+    obj.material_slots[0].link = 'OBJECT'
+    obj.material_slots[0].material = material
+
+
+## Assign a material to an object or to the strands of an instanced conductor
+# @param obj The object
+# @param material The material
+def set_material(obj, material):
+    for o in [obj] + list(obj.children):
+        # Skip empties and hidden bevel objects
+        if o.data is None or (o is not obj and o.hide):
+            continue
+
+        if o.data.library is not None:
+            set_object_material(o, material)
+        else:
+            o.active_material = material
+
+
+## Replace the material of a generated conductor, braid or armour
+# @param obj The object, or the empty parent of a conductor array
+# @param material String describing the conductor material
+def set_conductor_material(obj, material):
+    set_material(obj, cm.CONDUCTOR_MATERIALS[material]())
+
+
 ## Creates a parametric conductor and puts it in the scene
 # @param length Total conductor length in Z-axis
 # @param conductor_radius Total radius of the combined conductor
 # @param strand_radius Diameter of each strand. 0.0 for solid conductor
 # @param strand_pitch Number of revolutions per length unit
 # @param context Context in which to create the conductor object
+# @param instanced Link strands of a ring to one curve instead of joining them
 # @return The new object
+@lod.controlled
 def make_conductor(length, conductor_radius, strand_radius, strand_pitch,
-                   material, clockwize, context):
+                   material, clockwize, context, instanced=False):
     # Solid conductor
     if conductor_radius == strand_radius or rco.about_eq(strand_radius, 0.0):
         conductor = make_solid_conductor(
@@ -431,109 +401,40 @@ def make_conductor(length, conductor_radius, strand_radius, strand_pitch,
             pitch=strand_pitch,
             strand_radius=strand_radius,
             clockwize=clockwize,
-            context=context)
+            context=context,
+            instanced=instanced)
 
-    conductor.active_material = cm.CONDUCTOR_MATERIALS[material]()
+    set_material(conductor, cm.CONDUCTOR_MATERIALS[material]())
 
     return conductor
 
 
-# make_braid_strand
-# Creates a helical strand with alternating radii to be used with make_braid
-# function.
+## Create an object from a cached curve that uses a bevel object
+# The curve is appended rather than linked, so that its bevel object becomes
+# local and can be linked into the scene, hidden and parented to the curve
+# like a generated one. Blender only uses bevel objects that are evaluated in
+# the scene.
 #
-# @param length Axial length of helix
-# @param radius Radius of strand position
-# @param pitch Number of revolutions per length unit in helix
-# @param points_per_rev Number of points on helix for each revolution
-# @param strand_radius Radius of the strand
-# @param clockwise Rotation direction of helix
-# @param context Context in which to create the strand
-# @return The new object
-def make_braid_strand(length, radius, pitch, points_per_rev, strand_radius,
-                      clockwize, context):
-    # Calculate angle between each point
-    dtheta = (2.0 * math.pi) / points_per_rev
-    if not clockwize:
-        dtheta *= -1
-
-# Calculate total number of points
-    n_points = math.floor(points_per_rev * pitch * length)
-
-    # Calculate handle offsets
-    handle_length = (4.0 / 3.0) * math.tan(math.pi / (2.0 * (
-        (2.0 * math.pi) / dtheta))) * radius
-    handle_radius = math.sqrt(radius**2 + handle_length**2)
-    htheta = math.acos(radius / handle_radius)
-
-    # Calculate z offset for handles
-    dz = (length / (length * pitch * 2 * math.pi)) * htheta
-
-    #Create a Bezier curve object
-    curveData = bpy.data.curves.new('HelixCurve', type='CURVE')
-    curveData.dimensions = '3D'
-    curveData.resolution_u = 1
-    curveData.render_resolution_u = 10
-    curveData.use_fill_caps = True
-    curveData.use_radius = True
-    polyline = curveData.splines.new('BEZIER')
-    polyline.bezier_points.add(n_points)
-
-    # Determine start offset of alternating point radius
-    if clockwize:
-        offs = 1
-    else:
-        offs = 5
-
-    z = 0.0
-    for i in range(n_points + 1):
-        # Calculate z position of point
-        z = length * (i / n_points)
-
-        # Determine if point is to be pulled in or out
-        if offs >= 0 and offs <= 2:
-            dradius = strand_radius * 1.1
-        elif offs >= 4 and offs <= 6:
-            dradius = strand_radius * -1.1
-        else:
-            dradius = 0
-        offs += 1
-        if offs > 7:
-            offs = 0
-
-        # Calculate point position
-        polyline.bezier_points[i].co[0] = (radius + dradius) * math.cos(
-            dtheta * i)
-        polyline.bezier_points[i].co[1] = (radius + dradius) * math.sin(
-            dtheta * i)
-        polyline.bezier_points[i].co[2] = z
-
-        # Calculate handle positions
-        if not clockwize:
-            handle_b = polyline.bezier_points[i].handle_left
-            handle_a = polyline.bezier_points[i].handle_right
-            tmpdz = dz
-        else:
-            handle_a = polyline.bezier_points[i].handle_left
-            handle_b = polyline.bezier_points[i].handle_right
-            tmpdz = dz * -1.0
-
-        handle_a[0] = (
-            handle_radius + dradius) * math.cos((dtheta * i) - htheta)
-        handle_a[1] = (
-            handle_radius + dradius) * math.sin((dtheta * i) - htheta)
-        handle_a[2] = z + tmpdz
-
-        handle_b[0] = (
-            handle_radius + dradius) * math.cos((dtheta * i) + htheta)
-        handle_b[1] = (
-            handle_radius + dradius) * math.sin((dtheta * i) + htheta)
-        handle_b[2] = z - tmpdz
+# @param kind Name of the generator
+# @param cache_params Sequence of generator parameters
+# @param name Name of the new object
+# @param context Context in which to create the object
+# @return The new object or None if the curve is not in the cache
+def load_beveled_curve(kind, cache_params, name, context):
+    data = geometrycache.load(kind, cache_params, 'curves', link=False)
+    if data is None:
+        return None
 
-    # Create object
-    ret = bpy.data.objects.new('Helix', curveData)
+    ret = bpy.data.objects.new(name, data)
     context.scene.objects.link(ret)
     context.scene.objects.active = ret
+
+    profile = data.bevel_object
+    if profile is not None:
+        context.scene.objects.link(profile)
+        profile.parent = ret
+        profile.hide = True
+
     return ret
 
 
@@ -548,235 +449,158 @@ def make_braid_strand(length, radius, pitch, points_per_rev, strand_radius,
 # @param material String describing the conductor material
 # @param context Context in which to create the braid
 # @return The new object
+@lod.controlled
 def make_braid(length, radius, bundle_size, n_bundle_pairs, pitch,
                strand_radius, material, context):
-    # Calculate total number of bundles
-    n_bundles = int(n_bundle_pairs * 2)
+    cache_params = (length, radius, bundle_size, n_bundle_pairs, pitch,
+                    strand_radius)
+    ret = load_beveled_curve('braid', cache_params, "Braid", context)
+    if ret is not None:
+        set_material(ret, cm.CONDUCTOR_MATERIALS[material]())
+        return ret
 
-    #Create progress indicator
-    wm = bpy.context.window_manager
-    wm.progress_begin(0, n_bundles + bundle_size)
+    co, handle_left, handle_right = cablegeom.curves.braid(
+        length, radius, bundle_size, n_bundle_pairs, pitch, strand_radius)
 
-    # Create shared bevel object
+    # All strands are splines of one curve sharing a single bevel object
     strand_profile = rco.make_bezier_circle(strand_radius, context)
 
-    # Calculate angles
-    dtheta = (2.0 * math.pi) / n_bundles
-    strand_dtheta = (2.0 * math.pi) / ((radius * math.pi) / strand_radius)
+    curveData = bpy.data.curves.new('BraidCurve', type='CURVE')
+    curveData.dimensions = '3D'
+    curveData.resolution_u = 1
+    curveData.render_resolution_u = 10
+    curveData.use_fill_caps = True
+    curveData.use_radius = True
+    curveData.bevel_object = strand_profile
+    rco.bezier_splines_from_arrays(curveData, co, handle_left, handle_right)
+
+    ret = bpy.data.objects.new("Braid", curveData)
+    context.scene.objects.link(ret)
+    context.scene.objects.active = ret
 
-    # Create clockwise strand
-    cw_strands = [make_braid_strand(length, radius, pitch, n_bundles * 4,
-                                    strand_radius, True, context)]
-    cw_strands[0].data.bevel_object = strand_profile
-    # Create counter-clockwise strand
-    ccw_strands = [make_braid_strand(length, radius, pitch, n_bundles * 4,
-                                     strand_radius, False, context)]
-    ccw_strands[0].rotation_euler = (0, 0, (dtheta / 2))
-    ccw_strands[0].data.bevel_object = strand_profile
+    # Stored before parenting so that the library does not hold the object
+    geometrycache.store('braid', cache_params, ret.data)
 
-    progress = 0
-    for i in range(1, n_bundles):
-        cw_strands.append(rco.deep_link_object(cw_strands[0], context))
-        cw_strands[-1].rotation_euler = (0, 0, (i * dtheta))
-        ccw_strands.append(rco.deep_link_object(ccw_strands[0], context))
-        ccw_strands[-1].rotation_euler = (0, 0, (i * dtheta) + (dtheta / 2))
-        progress += 1
-        wm.progress_update(progress)
-
-    cw_strands += ccw_strands
-    strands = [rco.join_objects(cw_strands, context)]
-
-    for i in range(bundle_size):
-        strands.append(rco.deep_link_object(strands[0], context))
-        strands[-1].rotation_euler = (0, 0, strand_dtheta * i)
-        progress += 1
-        wm.progress_update(progress)
-
-    ret = rco.join_objects(strands, context)
-    ret.name = "Braid"
     strand_profile.parent = ret
     strand_profile.hide = True
 
     ret.active_material = cm.CONDUCTOR_MATERIALS[material]()
 
-    wm.progress_end()
-
     return ret
 
 
-## Adds a cylindrical feature to existing mesh
-#
-# @param length Axial length of the cylinder
-# @param radius Radius of the cylinder
-# @param mesh_data Bmesh object to create cylinder in
-def make_mesh_straight_strand(length, radius, mesh_data):
-    ppr = 8
-    n_circles = math.floor(100 * length)
-    dz = length / n_circles
-    dtheta = (2.0 * math.pi) / ppr
-
-    for i in range(n_circles + 1):
-        for j in range(ppr):
-            # Create vertices
-            x = radius * math.sin(j * dtheta)
-            y = radius * math.cos(j * dtheta)
-            z = dz * i
-
-            mesh_data.verts.new((x, y, z))
-            mesh_data.verts.ensure_lookup_table()
-
-            # Create side faces
-            if j > 0 and i > 0:
-                mesh_data.faces.new(
-                    (mesh_data.verts[-1], mesh_data.verts[-ppr - 1],
-                     mesh_data.verts[-ppr - 2], mesh_data.verts[-2]))
-        # Create last side face
-        if i > 0:
-            mesh_data.faces.new(
-                (mesh_data.verts[-ppr], mesh_data.verts[-1],
-                 mesh_data.verts[-ppr - 1], mesh_data.verts[-(ppr * 2)]))
-
-        # Create a surface on first and last circle
-        if i == 0 or i == n_circles:
-            cap_face = []
-            for j in range(ppr):
-                cap_face.append(mesh_data.verts[-j - 1])
-            mesh_data.faces.new(cap_face)
-
-
-## Adds a single twisted strand to an existing mesh
-#
-# @param length Axial length of the strand
-# @param radius Radius of strand position
-# @param pitch Revolutions per length unit
-# @param strand_radius Radius of the strand
-# @param mesh_data Bmesh object in which to create the strand
-# @param start_angle Angle of strand position
-def make_mesh_bunched_strand(length,
-                             radius,
-                             pitch,
-                             strand_radius,
-                             mesh_data,
-                             start_angle=0.0):
-    ppr = 10  # Points per revolution
-    cpr = math.floor((pitch / 0.05) * (radius / 0.005)) # Circles per revolution
-    if cpr < 10:
-        cpr = 10
-    elif cpr > 80:
-        cpr = 80
-
-    n_circles = math.floor(cpr * length * pitch)
-    dtheta_cp = (2.0 * math.pi) / ppr  # Angle between circle points
-    theta_x = math.atan((
-        (length / pitch) / 2) / radius)  # Angle to rotate circle along x-axis
-    dtheta_z = ((2.0 * math.pi) /
-                (pitch * cpr)) * 8  # Angle to rotate circle around origin
-
-    dz = length / n_circles  # Z distance between circles
-
-    for j in range(n_circles + 1):
-        for i in range(ppr):
-            # Calculate points on circle
-            x = strand_radius * math.sin(i * dtheta_cp) + radius
-            y = strand_radius * math.cos(i * dtheta_cp)
-            z = (dz * j) + (y * math.cos(theta_x))
-
-            # Rotate circle around origin
-            pr = math.sqrt(x**2 + y**2)
-            ptheta = math.atan(y / x)
-            x = pr * math.sin(j * dtheta_z - ptheta - start_angle)
-            y = pr * math.cos(j * dtheta_z - ptheta - start_angle)
-
-            # Create vertices
-            mesh_data.verts.new((x, y, z))
-            mesh_data.verts.ensure_lookup_table()
-
-            # Create side faces
-            if j > 0 and i > 0:
-                mesh_data.faces.new(
-                    (mesh_data.verts[-2], mesh_data.verts[-1],
-                     mesh_data.verts[-ppr - 1], mesh_data.verts[-ppr - 2]))
-
-        # Create final side face
-        if j > 0:
-            mesh_data.faces.new(
-                (mesh_data.verts[-ppr], mesh_data.verts[-1],
-                 mesh_data.verts[-ppr - 1], mesh_data.verts[-(ppr * 2)]))
-
-            # Create cap face for first and last circle
-        if j == 0 or j == n_circles:
-            cap_face = []
-            for i in range(ppr):
-                cap_face.append(mesh_data.verts[-(i + 1)])
-            mesh_data.faces.new(cap_face)
-
-
 ## Creates a mesh object representing a bunched set of strands
 # 
 # @param length Axial length of the conductor
 # @param radius Conductor radius
 # @param pitch Number of revolutions per length unit
 # @param strand_radius Radius of individual strands
-# @return The new object
-def make_stranded_mesh_conductor(length, radius, pitch, strand_radius):
-    bm = bmesh.new()
+# @param instanced Create one mesh per ring and link the other strands to it
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the conductor axis will be bent to,
+# or None if it stays straight
+# @return The new object. An empty parent of the strands if instanced
+@lod.controlled
+def make_stranded_mesh_conductor(length, radius, pitch, strand_radius,
+                                 instanced=False, chord_error=rco.CHORD_ERROR,
+                                 axial_radius=None):
+    layout = cablegeom.layout.ring_layout(radius - strand_radius,
+                                          strand_radius)
+
+    if instanced:
+        return make_instanced_mesh_conductor(length, pitch, strand_radius,
+                                             layout, chord_error, axial_radius)
+
+    cache_params = (length, radius, pitch, strand_radius, chord_error,
+                    axial_radius)
+    mesh = geometrycache.load('stranded_mesh_conductor', cache_params,
+                              'meshes')
+    if mesh is not None:
+        obj = bpy.data.objects.new("Conductor", mesh)
+        bpy.context.scene.objects.link(obj)
+        return obj
+
     obj = bpy.data.objects.new("Conductor",
                                bpy.data.meshes.new("ConductorMesh"))
     bpy.context.scene.objects.link(obj)
 
-    rc = radius - strand_radius
-    while True:
-        no = math.floor((2.0 * math.pi * rc) / (2.0 * strand_radius))
-        x0 = rc
-        y0 = 0.0
-        x1 = rc * math.cos(2 * math.pi / no)
-        y1 = rc * math.sin(2 * math.pi / no)
-        dist = math.sqrt((x0 - x1)**2 + (y0 - y1)**2)
-
-        if dist < 2.0 * strand_radius:
-            no -= 1
-
-        for i in range(no):
-            theta = ((2.0 * math.pi) / no) * i
-            make_mesh_bunched_strand(length, rc, pitch, strand_radius, bm,
-                                     theta)
-
-        rc_next = rc - (2.0 * strand_radius)
-        if rc_next < strand_radius:
-            if rc > 2.0 * strand_radius:
-                make_mesh_straight_strand(length, strand_radius, bm)
-            break
-        else:
-            rc = rc_next
+    strands = []
+    for r, angles in zip(layout.radii, cablegeom.layout.ring_angles(layout)):
+        for theta in angles:
+            if rco.about_eq(r, 0.0):
+                strands.append(cablegeom.mesh.straight_strand(
+                    length, strand_radius, chord_error, axial_radius))
+            else:
+                strands.append(cablegeom.mesh.bunched_strand(
+                    length, r, pitch, strand_radius, theta, chord_error,
+                    axial_radius))
 
-    bm.to_mesh(obj.data)
-    obj.data.update(1)
-    for f in obj.data.polygons:
-        f.use_smooth = True
+    rco.mesh_from_arrays(obj.data, *cablegeom.mesh.join(strands),
+                         smooth=True)
+
+    geometrycache.store('stranded_mesh_conductor', cache_params, obj.data)
 
     return obj
 
 
+## Creates a stranded mesh conductor with one mesh per ring of strands
+# Every strand in a ring is an object linked to the ring mesh and rotated
+# around the Z-axis.
+#
+# @param length Axial length of the conductor
+# @param pitch Number of revolutions per length unit
+# @param strand_radius Radius of individual strands
+# @param layout The cablegeom.layout.RingLayout of the conductor
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the conductor axis will be bent to,
+# or None if it stays straight
+# @return An empty parent of the strand objects
+@lod.controlled
+def make_instanced_mesh_conductor(length, pitch, strand_radius, layout,
+                                  chord_error=rco.CHORD_ERROR,
+                                  axial_radius=None):
+    ret = bpy.data.objects.new("Conductor", None)
+    bpy.context.scene.objects.link(ret)
+
+    for r, angles in zip(layout.radii, cablegeom.layout.ring_angles(layout)):
+        if rco.about_eq(r, 0.0):
+            strand = cablegeom.mesh.straight_strand(length, strand_radius,
+                                                    chord_error, axial_radius)
+        else:
+            strand = cablegeom.mesh.bunched_strand(length, r, pitch,
+                                                   strand_radius, 0.0,
+                                                   chord_error, axial_radius)
+
+        mesh = bpy.data.meshes.new("ConductorStrandMesh")
+        rco.mesh_from_arrays(mesh, *strand, smooth=True)
+
+        for theta in angles:
+            obj = bpy.data.objects.new("ConductorStrand", mesh)
+            obj.rotation_euler = (0, 0, theta)
+            obj.parent = ret
+            bpy.context.scene.objects.link(obj)
+
+    return ret
+
+
 ## Creates an object with a cylinder mesh
 #
 # @param length Axial length in Z-axis
 # @param radius Radius of the conductor
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the conductor axis will be bent to,
+# or None if it stays straight
 # @return The new object
-def make_solid_mesh_conductor(length, radius):
-    bm = bmesh.new()
+@lod.controlled
+def make_solid_mesh_conductor(length, radius, chord_error=rco.CHORD_ERROR,
+                              axial_radius=None):
     obj = bpy.data.objects.new("Conductor",
                                bpy.data.meshes.new("ConductorMesh"))
     bpy.context.scene.objects.link(obj)
 
-    make_mesh_straight_strand(length, radius, bm)
-
-    bm.to_mesh(obj.data)
-
-    # Calculate normals
-    obj.data.update(1)
-    # Set smooth shading
-    for f in obj.data.polygons:
-        f.use_smooth = True
+    arrays = cablegeom.mesh.straight_strand(length, radius, chord_error,
+                                            axial_radius)
+    rco.mesh_from_arrays(obj.data, *arrays, smooth=True)
 
     return obj
 
@@ -786,28 +610,45 @@ def make_solid_mesh_conductor(length, radius):
 # @param conductor_radius Total radius of the combined conductor
 # @param strand_radius Diameter of each strand. 0.0 for solid conductor
 # @param strand_pitch Number of revolutions per length unit
+# @param instanced Create one mesh per ring of strands and link the other
+# strands to it
+# @param chord_error Largest distance between the mesh and the true surface
+# @param axial_radius Radius of curvature the conductor axis will be bent to,
+# or None if it stays straight
+@lod.controlled
 def make_mesh_conductor(length, conductor_radius, strand_radius, strand_pitch,
-                        material):
+                        material, instanced=False, chord_error=rco.CHORD_ERROR,
+                        axial_radius=None):
     # Solid conductor
     if conductor_radius == strand_radius or rco.about_eq(strand_radius, 0.0):
         conductor = make_solid_mesh_conductor(
-            length=length, radius=conductor_radius)
+            length=length, radius=conductor_radius, chord_error=chord_error,
+            axial_radius=axial_radius)
     # Stranded conductor
     else:
         conductor = make_stranded_mesh_conductor(
             length=length,
             radius=conductor_radius,
             pitch=strand_pitch,
-            strand_radius=strand_radius)
+            strand_radius=strand_radius,
+            instanced=instanced,
+            chord_error=chord_error,
+            axial_radius=axial_radius)
+
+    if conductor.data is None:
+        strands = conductor.children
+    else:
+        strands = [conductor]
 
     # Add modifiers
-    es_mod = conductor.modifiers.new('EdgeSplit', type="EDGE_SPLIT")
-    es_mod.split_angle = 1.22
-    subsurf_mod = conductor.modifiers.new('SubSurf', type="SUBSURF")
-    subsurf_mod.levels = 0
-    subsurf_mod.render_levels = 2
+    for strand in strands:
+        es_mod = strand.modifiers.new('EdgeSplit', type="EDGE_SPLIT")
+        es_mod.split_angle = 1.22
+        subsurf_mod = strand.modifiers.new('SubSurf', type="SUBSURF")
+        subsurf_mod.levels = 0
+        subsurf_mod.render_levels = 2
 
-    conductor.active_material = cm.CONDUCTOR_MATERIALS[material]()
+    set_material(conductor, cm.CONDUCTOR_MATERIALS[material]())
 
     bpy.context.scene.objects.active = conductor
 
@@ -829,6 +670,7 @@ def make_mesh_conductor(length, conductor_radius, strand_radius, strand_pitch,
 # @param context Context in which to create the array
 #
 # @return The new object
+@lod.controlled
 def make_conductor_array(length, pitch, radius, conductor_radius, strand_pitch,
                          material, strand_radius, clockwize, n_conductors,
                          context):
@@ -839,28 +681,30 @@ def make_conductor_array(length, pitch, radius, conductor_radius, strand_pitch,
     ret = bpy.data.objects.new("ConductorArray", None)
     context.scene.objects.link(ret)
 
-    # Create guide curve for curve modifier
-    guide_curve = rco.make_bezier_helix(length, pitch, radius, clockwize, 
-                                        context)
-
-    # Create conductor
-    hl = rco.helical_length(radius, pitch, length)
+    # Create a straight conductor with the length of the helix
+    hl = cablegeom.curves.helical_length(radius, pitch, length)
+    axial_radius = cablegeom.curves.helix_curvature_radius(radius, pitch)
     conductor = make_mesh_conductor(hl, conductor_radius, strand_radius,
-                                    strand_pitch, material)
+                                    strand_pitch, material,
+                                    axial_radius=axial_radius)
     conductor.parent = ret
 
-    #Apply edge split modifier
-    bpy.ops.object.modifier_apply(apply_as='DATA', modifier="EdgeSplit")
-
-    bpy.ops.object.modifier_apply(apply_as='DATA', modifier="cond_circ_arr")
-    # Create and apply curve modifier
-    curve_mod = conductor.modifiers.new('cond_circ_arr', 'CURVE')
-    curve_mod.object = guide_curve
-    curve_mod.deform_axis = 'POS_Z'
-    bpy.ops.object.modifier_apply(apply_as='DATA', modifier="cond_circ_arr")
-
-    # Don't need the guide curve any more
-    context.scene.objects.unlink(guide_curve)
+    # Meshes loaded from the geometry cache are linked and read only. Move
+    # the material back to the local data so that the copies share it
+    if conductor.data.library is not None:
+        material = conductor.active_material
+        conductor.data = conductor.data.copy()
+        conductor.material_slots[0].link = 'DATA'
+        conductor.active_material = material
+
+    # Bend the conductor along the helix of the array
+    mesh = conductor.data
+    verts = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', verts)
+    verts = cablegeom.mesh.helix_deform(verts, length, pitch, radius,
+                                        clockwize)
+    mesh.vertices.foreach_set('co', verts.astype(np.float32).ravel())
+    mesh.update()
 
     conductors = [conductor]
 
@@ -868,6 +712,7 @@ def make_conductor_array(length, pitch, radius, conductor_radius, strand_pitch,
     theta = dtheta = (2.0 * math.pi) / n_conductors
     for i in range(0, n_conductors - 1):
         ob_new = rco.deep_link_object(conductor, context)
+        rco.copy_modifiers(conductor, ob_new)
         ob_new.rotation_euler = (0, 0, theta)
         conductors.append(ob_new)
         ob_new.parent = ret
@@ -892,6 +737,7 @@ def make_conductor_array(length, pitch, radius, conductor_radius, strand_pitch,
 # @param context Context in which to create the array
 #
 # @return The new object
+@lod.controlled
 def make_insulator_array(length, pitch, radius, outer_radius, inner_radius,
                          material, colors, clockwize, peel_length, context):
     # Create empty base object
@@ -899,69 +745,76 @@ def make_insulator_array(length, pitch, radius, outer_radius, inner_radius,
     context.scene.objects.link(ret)
 
     color_names = colors.split()
+    for color_name in color_names:
+        if color_name not in cm.INSULATOR_COLORS.keys() and \
+                color_name not in cm.STRIPE_TYPES.keys():
+            raise rco.InputError("\"%s\" is not a valid colour name" %
+                                 color_name)
 
     dtheta = (2.0 * math.pi) / len(color_names)
-    theta = 0.0
 
-    print(colors)
+    # All cores share the helix. The bevel object is a property of the curve
+    # data, so there is one copy of the helix per distinct profile
+    helix = rco.make_bezier_helix(length, pitch, radius, clockwize, context)
+    helix_data = helix.data
+    context.scene.objects.unlink(helix)
+    bpy.data.objects.remove(helix)
+
+    helix_data.use_fill_caps = True
+    helix_data.twist_mode = 'Z_UP'
+    helix_length = cablegeom.curves.helical_length(radius, pitch, length)
+    helix_data.bevel_factor_start = peel_length * (1 / helix_length)
+
+    # Map profile key to curve data beveled by that profile
+    shared_data = {}
+
+    def beveled_data(key, profile):
+        data = helix_data if not shared_data else helix_data.copy()
+        data.bevel_object = profile
+        profile.parent = ret
+        profile.hide = True
+        shared_data[key] = data
+        return data
 
-    for color_name in color_names:
-        guide_curve = rco.make_bezier_helix(length, pitch, radius, clockwize,
-                                            context)
-        guide_curve.data.use_fill_caps = True
-        guide_curve.data.twist_mode = 'Z_UP'
-        helix_length = rco.helical_length(radius, pitch, length)
-        guide_curve.data.bevel_factor_start = peel_length * (1 / helix_length)
+    for i, color_name in enumerate(color_names):
+        theta = i * dtheta
 
         # Solid coloured insulator
         if color_name in cm.INSULATOR_COLORS.keys():
-            base_profile = rco.make_tube_section(outer_radius, inner_radius,
-                                                 context)
-            base_profile.parent = guide_curve
-            base_profile.hide = True
-            guide_curve.data.bevel_object = base_profile
+            if 'solid' not in shared_data:
+                beveled_data('solid', rco.make_tube_section(
+                    outer_radius, inner_radius, context))
+            core = bpy.data.objects.new('Insulator', shared_data['solid'])
             color = cm.INSULATOR_COLORS[color_name]
-            guide_curve.active_material = cm.INSULATOR_MATERIALS[material](
-                color, outer_radius)
         # Striped insulator
-        elif color_name in cm.STRIPE_TYPES.keys():
-            stripe_data = cm.STRIPE_TYPES[color_name]
-            base_color = stripe_data[0]
-            stripe_color = stripe_data[1]
-            amount = stripe_data[2]
-            double_sided = stripe_data[3]
-
-            base_profile, stripe_profile = make_striped_tube_section(
-                outer_radius, inner_radius, amount, double_sided, context)
-
-            # Make a copy of the guide curve for our stripe
-            stripe_curve = bpy.data.objects.new('StripeCurve',
-                                                guide_curve.data.copy())
-            stripe_curve.rotation_euler = (0, 0, theta)
-            stripe_curve.parent = ret
-            stripe_curve.name = 'InsulatorStripe'
+        else:
+            base_color, stripe_color, amount, double_sided = \
+                cm.STRIPE_TYPES[color_name][:4]
+
+            if ('stripe', color_name) not in shared_data:
+                base_profile, stripe_profile = make_striped_tube_section(
+                    outer_radius, inner_radius, amount, double_sided,
+                    context)
+                beveled_data(('base', color_name), base_profile)
+                beveled_data(('stripe', color_name), stripe_profile)
+
+            core = bpy.data.objects.new(
+                'Insulator', shared_data[('base', color_name)])
+            color = base_color
+
+            stripe_curve = bpy.data.objects.new(
+                'InsulatorStripe', shared_data[('stripe', color_name)])
             context.scene.objects.link(stripe_curve)
+            stripe_curve.rotation_euler = (0, 0, theta)
             stripe_curve.parent = ret
+            set_object_material(stripe_curve, cm.INSULATOR_MATERIALS[
+                material](stripe_color, outer_radius))
 
-            stripe_profile.parent = stripe_curve
-            stripe_profile.hide = True
-            base_profile.parent = guide_curve
-            base_profile.hide = True
-
-            guide_curve.data.bevel_object = base_profile
-            guide_curve.active_material = cm.INSULATOR_MATERIALS[material](
-                base_color, outer_radius)
-            stripe_curve.data.bevel_object = stripe_profile
-            stripe_curve.active_material = cm.INSULATOR_MATERIALS[material](
-                stripe_color, outer_radius)
-        else:
-            raise rco.InputError("\"%s\" is not a valid colour name" % color[0])
-
-        guide_curve.rotation_euler = (0, 0, theta)
-        theta += dtheta
-
-        guide_curve.parent = ret
-        guide_curve.name = 'Insulator'
+        context.scene.objects.link(core)
+        core.rotation_euler = (0, 0, theta)
+        core.parent = ret
+        set_object_material(core, cm.INSULATOR_MATERIALS[material](
+            color, outer_radius))
 
     return ret
 
@@ -985,6 +838,7 @@ def make_insulator_array(length, pitch, radius, outer_radius, inner_radius,
 # @param context Context in which to create the array
 #
 # @return The new object
+@lod.controlled
 def make_part_array(length, pitch, radius, clockwize, ins_outer_radius,
                     ins_inner_radius, ins_material, ins_colors,
                     ins_peel_length, cond_radius, cond_strand_pitch,
@@ -1022,11 +876,13 @@ def make_part_array(length, pitch, radius, clockwize, ins_outer_radius,
 # @param strand_radius Radius of individual strands
 # @param strand_pitch Revolutions per length unit in strand twisting
 # @param context Context in which to create the part
+# @param instanced Link conductor strands of a ring to one mesh
 #
 # @return The new object
+@lod.controlled
 def make_part(length, ins_radius, ins_color, ins_material, peel_length,
               cond_radius, cond_material, strand_radius, strand_pitch,
-              context):
+              context, instanced=False):
     # Create empty base object
     ret = bpy.data.objects.new("Part", None)
     context.scene.objects.link(ret)
@@ -1036,7 +892,7 @@ def make_part(length, ins_radius, ins_color, ins_material, peel_length,
     insulator.parent = ret
 
     conductor = make_mesh_conductor(length, cond_radius, strand_radius,
-                                    strand_pitch, cond_material)
+                                    strand_pitch, cond_material, instanced)
     conductor.parent = ret
 
     return ret
@@ -1052,6 +908,7 @@ def make_part(length, ins_radius, ins_color, ins_material, peel_length,
 # @param context Context in wich to create the filler
 # 
 # @return the central filler object
+@lod.controlled
 def make_central_filler(length, outer_radius, inner_radius, material, context):
     filler = rco.make_mesh_tube(outer_radius, inner_radius, length, context)
     filler.name = "Filler"
@@ -1071,6 +928,7 @@ def make_central_filler(length, outer_radius, inner_radius, material, context):
 # @param context Context in wich to create the lap
 # 
 # @return The object
+@lod.controlled
 def make_lap(length, radius, material, context):
     # Create object
     lap = rco.make_mesh_shell_tube(length, radius, context)
@@ -1102,6 +960,7 @@ def make_lap(length, radius, material, context):
 # @param context
 # 
 # @return 
+@lod.controlled
 def make_armour(length, radius, strand_radius, n_strands, pitch, clockwize,
                 material, context):
 
@@ -1112,6 +971,13 @@ def make_armour(length, radius, strand_radius, n_strands, pitch, clockwize,
     if rco.about_eq(length, 0.0):
         raise rco.InputError("Length is zero")
 
+    cache_params = (length, radius, strand_radius, n_strands, pitch,
+                    clockwize)
+    ret = load_beveled_curve('armour', cache_params, 'Armour', context)
+    if ret is not None:
+        set_material(ret, cm.CONDUCTOR_MATERIALS[material]())
+        return ret
+
     #Create a Bezier curve object
     curveData = bpy.data.curves.new('HelixCurve', type='CURVE')
     curveData.dimensions = '3D'
@@ -1132,13 +998,19 @@ def make_armour(length, radius, strand_radius, n_strands, pitch, clockwize,
     ret = bpy.data.objects.new('Armour', curveData)
 
     circle = rco.make_bezier_circle(strand_radius, context)
-    circle.parent = ret
     curveData.bevel_object = circle
 
     context.scene.objects.link(ret)
     context.scene.objects.active = ret
 
+    # Stored before parenting so that the library does not hold the object
+    geometrycache.store('armour', cache_params, curveData)
+
+    circle.parent = ret
+
     ret.active_material = cm.CONDUCTOR_MATERIALS[material]()
 
     return ret
 
+rco.track(globals())
+tracing.instrument(globals())
@@ -0,0 +1,227 @@
+## @package geometrycache
+# On-disk library of generated geometry.
+# Curve and mesh datablocks are written to one .blend file each, named by a
+# hash of the generator and its parameters. Later builds link the datablock
+# from the library instead of generating it again. Set the CT_GEOMETRY_CACHE
+# environment variable to a directory to enable the cache.
+
+import bpy
+import hashlib
+import json
+import os
+
+## Directory of the library. The cache is disabled when empty
+CACHE_DIR = os.environ.get('CT_GEOMETRY_CACHE', '')
+
+## Maximum total size of the library in bytes
+MAX_SIZE = int(os.environ.get('CT_GEOMETRY_CACHE_SIZE', 2 * 1024**3))
+
+## Link cached datablocks. Append them if False
+LINK = True
+
+## Bump to invalidate the library when generated geometry changes in a way the
+# source digest does not catch
+GENERATOR_VERSION = 1
+
+## Modules whose source is part of the version stamp
+GENERATOR_MODULES = ('cabletools.py', 'rco.py', 'cablegeom/__init__.py',
+                     'cablegeom/curves.py', 'cablegeom/layout.py',
+                     'cablegeom/mesh.py', 'cablegeom/tessellation.py')
+
+_stamp = None
+_checked = False
+
+
+##
+# @brief Version stamp of the generator code
+#
+# @return Hex digest of GENERATOR_VERSION and the generator module sources
+def version_stamp():
+    global _stamp
+    if _stamp is None:
+        h = hashlib.sha1(str(GENERATOR_VERSION).encode())
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for name in GENERATOR_MODULES:
+            filename = os.path.join(folder, name)
+            if os.path.exists(filename):
+                with open(filename, 'rb') as f:
+                    h.update(f.read())
+        _stamp = h.hexdigest()
+
+    return _stamp
+
+
+##
+# @brief Check if the cache is enabled
+#
+# @return True if CACHE_DIR is set
+def enabled():
+    return bool(CACHE_DIR)
+
+
+##
+# @brief Make sure the library exists and was written by the current
+# generator code. Stale entries are removed.
+def check_library():
+    global _checked
+    if _checked:
+        return
+
+    if not os.path.isdir(CACHE_DIR):
+        try:
+            os.makedirs(CACHE_DIR)
+        except OSError:
+            # Created by another worker
+            if not os.path.isdir(CACHE_DIR):
+                raise
+
+    stamp_file = os.path.join(CACHE_DIR, 'VERSION')
+    stamp = None
+    if os.path.exists(stamp_file):
+        with open(stamp_file) as f:
+            stamp = f.read().strip()
+
+    if stamp != version_stamp():
+        for filename in entries():
+            remove(filename)
+        with open(stamp_file, 'w') as f:
+            f.write(version_stamp())
+
+    _checked = True
+
+
+##
+# @brief List library files
+#
+# @return List of paths to .blend files in the library
+def entries():
+    return [os.path.join(CACHE_DIR, f) for f in os.listdir(CACHE_DIR)
+            if f.endswith('.blend')]
+
+
+##
+# @brief Calculate the name of a library entry
+#
+# @param kind Name of the generator
+# @param params Sequence of generator parameters
+#
+# @return Hex digest used as file and datablock name
+def entry_key(kind, params):
+    params = [round(p, 9) if isinstance(p, float) else p for p in params]
+    return hashlib.sha1(json.dumps([kind, params]).encode()).hexdigest()
+
+
+##
+# @brief Load a datablock from the library
+#
+# @param kind Name of the generator
+# @param params Sequence of generator parameters
+# @param collection Name of the bpy.data collection, 'curves' or 'meshes'
+# @param link Link the datablock. Append it if False. None uses LINK
+#
+# @return The loaded datablock or None if it is not in the library
+def load(kind, params, collection, link=None):
+    if not enabled():
+        return None
+
+    check_library()
+    key = entry_key(kind, params)
+    filename = os.path.join(CACHE_DIR, key + '.blend')
+    if not os.path.exists(filename):
+        return None
+
+    if link is None:
+        link = LINK
+
+    # Another worker may evict the entry at any time
+    try:
+        with bpy.data.libraries.load(filename, link=link) as (data_from,
+                                                               data_to):
+            if key not in getattr(data_from, collection):
+                return None
+            setattr(data_to, collection, [key])
+    except OSError:
+        return None
+
+    # Mark as recently used
+    try:
+        os.utime(filename, None)
+    except OSError:
+        pass
+
+    ret = getattr(data_to, collection)[0]
+    if not link:
+        # Entries are written with a fake user. Let appended data be freed
+        ret.use_fake_user = False
+
+    return ret
+
+
+##
+# @brief Write a generated datablock to the library
+# The datablock gets an empty material slot if it has none, so that objects
+# using the linked data can still get their own material.
+#
+# @param kind Name of the generator
+# @param params Sequence of generator parameters
+# @param datablock Curve or mesh datablock
+def store(kind, params, datablock):
+    if not enabled():
+        return
+
+    check_library()
+    key = entry_key(kind, params)
+    filename = os.path.join(CACHE_DIR, key + '.blend')
+
+    if len(datablock.materials) == 0:
+        datablock.materials.append(None)
+
+    name = datablock.name
+    datablock.name = key
+    tmp = "%s.%d.tmp" % (filename, os.getpid())
+    try:
+        bpy.data.libraries.write(tmp, {datablock}, fake_user=True)
+        os.rename(tmp, filename)
+    finally:
+        datablock.name = name
+
+    evict()
+
+
+##
+# @brief Remove a library file that another worker may already have removed
+#
+# @param filename Path to the file
+def remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+##
+# @brief Get the modification time and size of library files
+# Files removed by another worker in the meantime are left out.
+#
+# @return List of (mtime, size, filename) tuples
+def entry_stats():
+    ret = []
+    for filename in entries():
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        ret.append((st.st_mtime, st.st_size, filename))
+
+    return ret
+
+
+##
+# @brief Remove least recently used entries until the library fits MAX_SIZE
+def evict():
+    files = sorted(entry_stats())
+    total = sum(size for mtime, size, filename in files)
+    while files and total > MAX_SIZE:
+        mtime, size, filename = files.pop(0)
+        total -= size
+        remove(filename)
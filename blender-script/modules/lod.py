@@ -0,0 +1,296 @@
+## @package lod
+# Camera dependent level of detail.
+# Sets the curve resolution, bevel profile resolution and subdivision level
+# of generated objects so that the tessellation error seen from the camera
+# stays below MAX_PIXEL_ERROR pixels. Batch scripts call apply() with the
+# cameras they render from. Set the CT_LOD environment variable to 1 to also
+# apply it at the end of every builder, using the scene camera.
+
+import bpy
+import functools
+import math
+import os
+import cablegeom
+import numpy as np
+
+## Apply level of detail at the end of every decorated builder. Off by default
+# since objects built away from the scene camera would lose detail the user
+# did not ask to lose
+ENABLED = os.environ.get('CT_LOD', '') not in ('', '0')
+
+## Largest allowed tessellation error in pixels
+MAX_PIXEL_ERROR = 1.0
+
+## Limits of the curve and bevel resolution
+MIN_RESOLUTION = 1
+MAX_RESOLUTION = 64
+MAX_BEVEL_RESOLUTION = 16
+
+## Largest subdivision level set on SubSurf modifiers
+MAX_SUBSURF_LEVELS = 3
+
+_depth = 0
+
+
+##
+# @brief Resolution of the rendered image
+#
+# @param scene Scene with the render settings
+#
+# @return Number of pixels along the largest image dimension
+def image_size(scene):
+    r = scene.render
+    return max(r.resolution_x, r.resolution_y) * r.resolution_percentage / 100.0
+
+
+##
+# @brief Calculate the world space size of one pixel
+#
+# @param camera Camera object
+# @param scene Scene with the render settings
+# @param depth Distance from the camera along the view direction
+#
+# @return Size of one pixel at depth
+def pixel_size(camera, scene, depth):
+    if camera.data.type == 'ORTHO':
+        return camera.data.ortho_scale / image_size(scene)
+
+    return 2.0 * depth * math.tan(camera.data.angle / 2.0) / image_size(scene)
+
+
+##
+# @brief Calculate the allowed tessellation error of an object
+#
+# @param obj The object
+# @param cameras List of camera objects
+# @param scene Scene with the render settings
+#
+# @return Tolerance in world units, or None if no camera sees the object
+def tolerance(obj, cameras, scene):
+    m = np.array(obj.matrix_world)
+    corners = np.dot(np.array([c[:] for c in obj.bound_box]), m[:3, :3].T)
+    corners += m[:3, 3]
+
+    ret = None
+    for camera in cameras:
+        cm = np.array(camera.matrix_world)
+        # Cameras look along their negative z axis
+        depths = np.dot(cm[:3, 3] - corners, cm[:3, 2])
+        near = depths.min()
+        if depths.max() < camera.data.clip_start or \
+                near > camera.data.clip_end:
+            continue
+
+        near = max(near, camera.data.clip_start)
+        tol = MAX_PIXEL_ERROR * pixel_size(camera, scene, near)
+        if ret is None or tol < ret:
+            ret = tol
+
+    return ret
+
+
+##
+# @brief Largest scale factor of an object
+#
+# @param obj The object
+#
+# @return Scale factor of the world matrix
+def world_scale(obj):
+    return max(abs(s) for s in obj.matrix_world.to_scale())
+
+
+##
+# @brief Calculate the bezier resolution needed for curve data
+# The distance between a cubic bezier segment and its polyline with n segments
+# is at most 3/4 * M / n^2, where M is the largest second difference of the
+# control points.
+#
+# @param curve Curve data
+# @param tol Largest allowed distance in curve space
+#
+# @return Resolution of the curve
+def curve_resolution(curve, tol):
+    m = 0.0
+    for spline in curve.splines:
+        if spline.type != 'BEZIER' or len(spline.bezier_points) < 2:
+            continue
+
+        n = len(spline.bezier_points)
+        co = np.empty(n * 3)
+        hl = np.empty(n * 3)
+        hr = np.empty(n * 3)
+        spline.bezier_points.foreach_get('co', co)
+        spline.bezier_points.foreach_get('handle_left', hl)
+        spline.bezier_points.foreach_get('handle_right', hr)
+        co = co.reshape(-1, 3)
+        hl = hl.reshape(-1, 3)
+        hr = hr.reshape(-1, 3)
+
+        if spline.use_cyclic_u:
+            nxt = np.roll(np.arange(n), -1)
+        else:
+            nxt = np.arange(1, n)
+        p0 = co[:len(nxt)]
+        p1 = hr[:len(nxt)]
+        p2 = hl[nxt]
+        p3 = co[nxt]
+
+        d = np.maximum(np.linalg.norm(p0 - 2.0 * p1 + p2, axis=1),
+                       np.linalg.norm(p1 - 2.0 * p2 + p3, axis=1))
+        m = max(m, d.max())
+
+    res = int(math.ceil(math.sqrt(0.75 * m / tol))) if m > 0.0 else 1
+    return min(max(res, MIN_RESOLUTION), MAX_RESOLUTION)
+
+
+##
+# @brief Estimate the distance between a mesh and its limit surface
+# For an edge of length h whose vertex normals differ by the angle a, the
+# surface deviates about h * a / 8 from the edge.
+#
+# @param mesh Mesh data
+#
+# @return Largest estimated deviation in mesh space
+def mesh_error(mesh):
+    if len(mesh.edges) == 0:
+        return 0.0
+
+    co = np.empty(len(mesh.vertices) * 3)
+    normals = np.empty(len(mesh.vertices) * 3)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.vertices.foreach_get('co', co)
+    mesh.vertices.foreach_get('normal', normals)
+    mesh.edges.foreach_get('vertices', edges)
+    co = co.reshape(-1, 3)
+    normals = normals.reshape(-1, 3)
+    edges = edges.reshape(-1, 2)
+
+    h = np.linalg.norm(co[edges[:, 0]] - co[edges[:, 1]], axis=1)
+    cos_a = np.einsum('ij,ij->i', normals[edges[:, 0]], normals[edges[:, 1]])
+    a = np.arccos(np.clip(cos_a, -1.0, 1.0))
+
+    return (h * a).max() / 8.0
+
+
+##
+# @brief Calculate the subdivision level needed for a mesh
+# Each level halves the edge length and the normal angle of the edges, which
+# divides the error by four.
+#
+# @param err Error of the mesh as returned by mesh_error
+# @param tol Largest allowed error in mesh space
+#
+# @return Subdivision level
+def subsurf_levels(err, tol):
+    if err <= tol:
+        return 0
+    levels = int(math.ceil(math.log(err / tol, 4.0)))
+    return min(levels, MAX_SUBSURF_LEVELS)
+
+
+##
+# @brief List an object and all its descendants
+#
+# @param obj The object
+#
+# @return List of objects
+def descendants(obj):
+    ret = [obj]
+    for child in obj.children:
+        ret += descendants(child)
+    return ret
+
+
+##
+# @brief Apply level of detail to objects
+# Curve data shared by several objects gets the resolution needed by the
+# object closest to a camera. Linked library data is left unchanged.
+#
+# @param objects List of objects. Children are included
+# @param scene Scene with the render settings
+# @param cameras List of camera objects. Defaults to the scene camera
+def apply(objects, scene, cameras=None):
+    if cameras is None:
+        cameras = [scene.camera] if scene.camera is not None else []
+    if not cameras:
+        return
+
+    scene.update()
+
+    curves = {}
+    profiles = {}
+    errors = {}
+    for obj in objects:
+        for o in descendants(obj):
+            if o.data is None or o.hide_render:
+                continue
+
+            tol = tolerance(o, cameras, scene)
+            if tol is None:
+                # Not seen by any camera. Use the coarsest tessellation
+                tol = float('inf')
+            tol /= world_scale(o)
+
+            if o.type == 'CURVE':
+                curves[o.data] = min(curves.get(o.data, tol), tol)
+                if o.data.bevel_object is not None:
+                    profile = o.data.bevel_object.data
+                    profiles[profile] = min(profiles.get(profile, tol), tol)
+            elif o.type == 'MESH':
+                for mod in o.modifiers:
+                    if mod.type == 'SUBSURF':
+                        if o.data not in errors:
+                            errors[o.data] = mesh_error(o.data)
+                        levels = subsurf_levels(errors[o.data], tol)
+                        mod.render_levels = levels
+                        mod.levels = min(mod.levels, levels)
+
+    for data, tol in list(curves.items()) + list(profiles.items()):
+        if data.library is not None:
+            continue
+
+        res = curve_resolution(data, tol)
+        data.render_resolution_u = res
+        data.resolution_u = min(data.resolution_u, res)
+
+        if data in curves and data.bevel_depth > 0.0 and \
+                data.bevel_object is None:
+            n = cablegeom.tessellation.chord_segments(data.bevel_depth, tol,
+                                                      min_segments=4)
+            data.bevel_resolution = min(int(math.ceil(n / 4.0)) - 1,
+                                        MAX_BEVEL_RESOLUTION)
+
+
+##
+# @brief Apply level of detail to all objects in a scene
+#
+# @param scene The scene
+# @param cameras List of camera objects. Defaults to the scene camera
+def apply_scene(scene, cameras=None):
+    apply([o for o in scene.objects if o.parent is None], scene, cameras)
+
+
+##
+# @brief Decorator applying level of detail to the objects returned by a
+# builder. Builders called by other builders are handled by the outermost one.
+#
+# @param func Builder returning an object, a sequence of objects or None
+#
+# @return The decorated builder
+def controlled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _depth
+        _depth += 1
+        try:
+            ret = func(*args, **kwargs)
+        finally:
+            _depth -= 1
+
+        if ENABLED and _depth == 0 and ret is not None:
+            objects = ret if isinstance(ret, (tuple, list)) else [ret]
+            apply(objects, bpy.context.scene)
+
+        return ret
+
+    return wrapper
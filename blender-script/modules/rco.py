@@ -3,17 +3,33 @@
 # Dont add materials here
 
 import bpy
-import bmesh
+import cablegeom
+import cablegeom.curves
+import cablegeom.mesh
+import functools
 import math
+import numpy as np
+import tracing
+from cablegeom import InputError
+from cablegeom.tessellation import CHORD_ERROR
 
 JUNK_LAYER = (False, False, False, False, False, False, False, False, False,
               False, False, False, False, False, False, False, False, False,
               False, True)
 
+## Datablock collections recorded by tracked builders
+TRACKED_COLLECTIONS = ('objects', 'curves', 'meshes', 'materials')
 
-class InputError(Exception):
-    def __init__(self, msg):
-        super(InputError, self).__init__(msg)
+## Collections cleaned by reset_tracked and purge_orphans by default
+PURGE_COLLECTIONS = ('objects', 'curves', 'meshes', 'materials')
+
+## Approximate size in bytes of mesh and curve elements in Blender memory
+ELEMENT_BYTES = {'vertices': 20, 'edges': 12, 'loops': 8, 'polygons': 12,
+                 'bezier_points': 64, 'points': 36}
+
+# Pointers of datablocks created by tracked functions, by collection
+_created = dict((name, set()) for name in TRACKED_COLLECTIONS)
+_track_depth = [0]
 
 
 ## 
@@ -40,21 +56,256 @@ def deep_link_object(obj, context, with_children=False):
 
     return ret
 
+## Add copies of the modifiers of one object to another object
+# @param src Object to copy modifiers from
+# @param dst Object to copy modifiers to
+def copy_modifiers(src, dst):
+    for mod in src.modifiers:
+        new = dst.modifiers.new(mod.name, mod.type)
+        for prop in mod.bl_rna.properties:
+            if not prop.is_readonly and prop.identifier not in ('name',
+                                                                'type'):
+                setattr(new, prop.identifier, getattr(mod, prop.identifier))
+
+## Calculate the world matrix of an object from its location, rotation, scale
+# and parents. Unlike matrix_world this is valid before the scene is updated.
+# @param obj The object
+# @return The world matrix
+def object_matrix(obj):
+    matrix = obj.matrix_basis.copy()
+    if obj.parent is not None:
+        matrix = object_matrix(obj.parent) * obj.matrix_parent_inverse * matrix
+
+    return matrix
+
+## Apply a transformation matrix to an array of points
+# @param points Array of shape (n, 3)
+# @param matrix A 4x4 matrix
+# @return The transformed points
+def transform_points(points, matrix):
+    m = np.array(matrix, dtype=np.float64)
+    return np.dot(points, m[:3, :3].T) + m[:3, 3]
+
+## Copy a spline into a curve, transforming its points
+# @param spline The spline to copy
+# @param curve_data Curve to add the copy to
+# @param matrix Transformation matrix applied to the points
+# @param material_map Array mapping the material index of the spline to the
+# material index in curve_data
+# @return The new spline
+def copy_spline(spline, curve_data, matrix, material_map=None):
+    ret = curve_data.splines.new(spline.type)
+    for attr in ('use_cyclic_u', 'use_smooth', 'resolution_u', 'order_u',
+                 'use_endpoint_u', 'use_bezier_u', 'material_index'):
+        setattr(ret, attr, getattr(spline, attr))
+    if material_map is not None:
+        ret.material_index = int(material_map[min(spline.material_index,
+                                                  len(material_map) - 1)])
+
+    if spline.type == 'BEZIER':
+        src = spline.bezier_points
+        dst = ret.bezier_points
+        vectors = ('co', 'handle_left', 'handle_right')
+        size = 3
+    else:
+        src = spline.points
+        dst = ret.points
+        vectors = ('co',)
+        size = 4
+
+    n = len(src)
+    dst.add(n - 1)
+
+    # foreach_get does not support enum properties. The types are set before
+    # the positions since changing a type recalculates the handles.
+    if spline.type == 'BEZIER':
+        for s, d in zip(src, dst):
+            d.handle_left_type = s.handle_left_type
+            d.handle_right_type = s.handle_right_type
+
+    for attr in vectors:
+        buf = np.empty(n * size, dtype=np.float32)
+        src.foreach_get(attr, buf)
+        buf = buf.reshape(n, size)
+        buf[:, :3] = transform_points(buf[:, :3], matrix)
+        dst.foreach_set(attr, buf.ravel())
+
+    for attr in ('radius', 'tilt'):
+        buf = np.empty(n, dtype=np.float32)
+        src.foreach_get(attr, buf)
+        dst.foreach_set(attr, buf)
+
+    return ret
+
+## Merge the material slots of several objects
+# Slots using the same material are merged, like bpy.ops.object.join does
+# @param objects List of objects
+# @return Tuple of (materials, maps) where maps holds an array for each object
+# mapping its material indices to indices in materials
+def merge_materials(objects):
+    materials = []
+    index = {}
+    maps = []
+    for obj in objects:
+        mapping = []
+        for slot in obj.material_slots:
+            material = slot.material
+            key = 0 if material is None else material.as_pointer()
+            if key not in index:
+                index[key] = len(materials)
+                materials.append(material)
+            mapping.append(index[key])
+        maps.append(np.array(mapping or [0], dtype=np.int32))
+
+    return materials, maps
+
+## Merge the splines of several curve objects into a new curve datablock
+# Settings are taken from the first object. Material slots are merged.
+# @param objects List of curve objects
+# @param matrices Transformation matrix for each object
+# @return The new curve data
+def join_curve_data(objects, matrices):
+    materials, maps = merge_materials(objects)
+
+    ret = objects[0].data.copy()
+    ret.splines.clear()
+    ret.materials.clear()
+    for material in materials:
+        ret.materials.append(material)
+
+    for obj, matrix, material_map in zip(objects, matrices, maps):
+        for spline in obj.data.splines:
+            copy_spline(spline, ret, matrix, material_map)
+
+    return ret
+
+## Merge the geometry of several mesh objects into a new mesh datablock
+# Vertices and polygons are kept, edges are recalculated. Material slots are
+# merged.
+# @param objects List of mesh objects
+# @param matrices Transformation matrix for each object
+# @return The new mesh data
+def join_mesh_data(objects, matrices):
+    materials, maps = merge_materials(objects)
+
+    parts = []
+    smooth = []
+    material_index = []
+    for obj, matrix, material_map in zip(objects, matrices, maps):
+        mesh = obj.data
+        n_verts = len(mesh.vertices)
+        n_loops = len(mesh.loops)
+        n_polys = len(mesh.polygons)
+
+        verts = np.empty(n_verts * 3, dtype=np.float32)
+        mesh.vertices.foreach_get('co', verts)
+        loops = np.empty(n_loops, dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', loops)
+        loop_totals = np.empty(n_polys, dtype=np.int32)
+        mesh.polygons.foreach_get('loop_total', loop_totals)
+        # Polygons may not be stored in loop order
+        loop_starts = np.empty(n_polys, dtype=np.int32)
+        mesh.polygons.foreach_get('loop_start', loop_starts)
+        if n_polys > 0:
+            order = np.repeat(loop_starts - np.cumsum(loop_totals)
+                              + loop_totals, loop_totals)
+            loops = loops[order + np.arange(len(order))]
+
+        parts.append((transform_points(verts.reshape(-1, 3), matrix), loops,
+                      loop_totals))
+
+        buf = np.empty(n_polys, dtype=bool)
+        mesh.polygons.foreach_get('use_smooth', buf)
+        smooth.append(buf)
+        buf = np.empty(n_polys, dtype=np.int32)
+        mesh.polygons.foreach_get('material_index', buf)
+        np.clip(buf, 0, len(material_map) - 1, out=buf)
+        material_index.append(material_map[buf])
+
+    ret = bpy.data.meshes.new(objects[0].data.name)
+    for material in materials:
+        ret.materials.append(material)
+
+    mesh_from_arrays(ret, *cablegeom.mesh.join(parts))
+    ret.polygons.foreach_set('use_smooth', np.concatenate(smooth))
+    ret.polygons.foreach_set('material_index', np.concatenate(material_index))
+
+    return ret
+
 ## Convenience function to join a list of objects
+# The geometry is merged at data level with transforms baked in relative to the
+# first object, which keeps its name, transform and modifiers. The other
+# objects are removed. Selection, the active object and bpy.ops are not used,
+# so this also works without a 3D view.
 # @param objects List of objects to join
 # @param context Context containing the objects
-# @return The new object
+# @return The joined object
 def join_objects(objects, context):
     if len(objects) < 2:
         return
 
-    bpy.ops.object.select_all(action='DESELECT')
+    ret = objects[0]
+    for o in objects:
+        if o.type != ret.type:
+            raise InputError("Can not join %s object with %s object" %
+                             (o.type, ret.type))
+
+    inverse = object_matrix(ret).inverted()
+    matrices = [inverse * object_matrix(o) for o in objects]
+
+    if ret.type == 'CURVE':
+        data = join_curve_data(objects, matrices)
+        collection = bpy.data.curves
+    elif ret.type == 'MESH':
+        data = join_mesh_data(objects, matrices)
+        collection = bpy.data.meshes
+    else:
+        raise InputError("Can not join objects of type %s" % ret.type)
+
+    old_data = {}
+    for o in objects:
+        old_data[o.data.as_pointer()] = o.data
+
+    ret.data = data
+    # The merged materials are stored in the data
+    for slot in ret.material_slots:
+        if slot.link == 'OBJECT':
+            slot.material = None
+            slot.link = 'DATA'
+    for o in objects[1:]:
+        context.scene.objects.unlink(o)
+        bpy.data.objects.remove(o)
+
+    # Remove data that was only used by the joined objects
+    for d in old_data.values():
+        if d.users == 0:
+            collection.remove(d)
+
+    return ret
+
+## Remove an object, its children and data only used by them
+# @param obj The object
+# @param context Context containing the object
+def delete_object(obj, context):
+    objects = [obj]
     for o in objects:
-        o.select = True
-    context.scene.objects.active = objects[0]
-    bpy.ops.object.join()
+        objects.extend(o.children)
 
-    return context.active_object
+    data = dict((o.data.as_pointer(), o.data) for o in objects
+                if o.data is not None)
+
+    for o in objects:
+        if o.name in context.scene.objects:
+            context.scene.objects.unlink(o)
+        bpy.data.objects.remove(o)
+
+    for d in data.values():
+        if d.users > 0 or d.library is not None:
+            continue
+        if isinstance(d, bpy.types.Curve):
+            bpy.data.curves.remove(d)
+        elif isinstance(d, bpy.types.Mesh):
+            bpy.data.meshes.remove(d)
 
 ## 
 # @brief 
@@ -67,25 +318,8 @@ def make_bezier_circle_data(radius, curveData):
     polyline = curveData.splines.new('BEZIER')
     polyline.use_cyclic_u = True
     polyline.bezier_points.add(3)
-
-    dtheta = math.pi / 2.0
-    handle_length = (4.0 / 3.0) * math.tan(math.pi / (2.0 * (
-        (2.0 * math.pi) / dtheta))) * radius
-
-    for i in range(4):
-        polyline.bezier_points[i].co[0] = radius * math.cos(-dtheta * i)  #X
-        polyline.bezier_points[i].co[1] = radius * math.sin(-dtheta * i)  #Y
-
-        hh = math.sqrt(radius**2 + handle_length**2)
-        htheta = math.acos(radius / hh)
-        polyline.bezier_points[i].handle_left[0] = hh * math.cos((-dtheta * i) +
-                                                                 htheta)
-        polyline.bezier_points[i].handle_left[1] = hh * math.sin((-dtheta * i) +
-                                                                 htheta)
-        polyline.bezier_points[i].handle_right[0] = hh * math.cos((-dtheta * i)
-                                                                  - htheta)
-        polyline.bezier_points[i].handle_right[1] = hh * math.sin((-dtheta * i)
-                                                                  - htheta)
+    bezier_points_from_arrays(polyline,
+                              *cablegeom.curves.bezier_circle(radius))
 
     return polyline
 
@@ -142,24 +376,12 @@ def make_line(p1, p2, n_subdiv, context):
     objectData.data.resolution_u = 20
     scene.objects.link(objectData)
 
+    points = cablegeom.curves.line(p1, p2, n_subdiv)
     polyline = curveData.splines.new('POLY')
-    if n_subdiv <= 2:
-        polyline.points.add(2)
-        polyline.points[0].co = (p1[0], p1[1], p1[2], 1)
-        polyline.points[1].co = (p2[0], p2[1], p2[2], 1)
-    else:
-        polyline.points.add(n_subdiv - 1)
-        x = p1[0]
-        y = p1[1]
-        z = p1[2]
-        dx = (p2[0] - p1[0]) / (n_subdiv - 1)
-        dy = (p2[1] - p1[1]) / (n_subdiv - 1)
-        dz = (p2[2] - p1[2]) / (n_subdiv - 1)
-        for i in range(n_subdiv):
-            polyline.points[i].co = (x, y, z, 1.0)
-            x += dx
-            y += dy
-            z += dz
+    polyline.points.add(len(points) - 1)
+    co = np.ones((len(points), 4), dtype=np.float32)
+    co[:, :3] = points
+    polyline.points.foreach_set('co', co.ravel())
 
     scene.objects.active = objectData
 
@@ -182,6 +404,41 @@ def about_eq(a, b, precision=0.000001):
         return True
     return False
 
+## Upload control point and handle arrays to a bezier spline
+# The spline must already hold the same number of points as the arrays
+# @param polyline Bezier spline to fill
+# @param co Array of shape (n, 3) with control point positions
+# @param handle_left Array of shape (n, 3) with left handle positions
+# @param handle_right Array of shape (n, 3) with right handle positions
+def bezier_points_from_arrays(polyline, co, handle_left, handle_right):
+    points = polyline.bezier_points
+    points.foreach_set('co', np.asarray(co, dtype=np.float32).ravel())
+    points.foreach_set('handle_left',
+                       np.asarray(handle_left, dtype=np.float32).ravel())
+    points.foreach_set('handle_right',
+                       np.asarray(handle_right, dtype=np.float32).ravel())
+
+## Add one bezier spline per row of control point and handle arrays
+# @param curve_data Curve datablock receiving the splines
+# @param co Array of shape (n_splines, n_points, 3) with control points
+# @param handle_left Array of the same shape with left handles
+# @param handle_right Array of the same shape with right handles
+# @return List of the new splines
+def bezier_splines_from_arrays(curve_data, co, handle_left, handle_right):
+    co = np.asarray(co, dtype=np.float32)
+    handle_left = np.asarray(handle_left, dtype=np.float32)
+    handle_right = np.asarray(handle_right, dtype=np.float32)
+
+    ret = []
+    for i in range(len(co)):
+        polyline = curve_data.splines.new('BEZIER')
+        polyline.bezier_points.add(co.shape[1] - 1)
+        bezier_points_from_arrays(polyline, co[i], handle_left[i],
+                                  handle_right[i])
+        ret.append(polyline)
+
+    return ret
+
 ## 
 # @brief Helper function for make_bezier_helix
 # 
@@ -194,52 +451,12 @@ def about_eq(a, b, precision=0.000001):
 # @return 
 def make_bezier_helix_data(length, pitch, radius, clockwize, start_angle,
                            curve_data):
-    polyline = curve_data.splines.new('BEZIER')
-
-    n_points = math.floor(length * pitch * 4)
-
-# Need at least 3 points to make a helix
-    if n_points < 3:
-        n_points = 3
-
-    dtheta = (2.0 * math.pi * pitch * length) / (n_points - 1)
-
-    polyline.bezier_points.add(n_points -1)
-
-    ppr = (2.0 * math.pi) / dtheta
+    co, handle_left, handle_right = cablegeom.curves.bezier_helix(
+        length, pitch, radius, clockwize, start_angle)
 
-    if clockwize:
-        dtheta = -dtheta 
-
-    handle_length = radius * (4.0/3.0) * math.tan(math.pi/(2.0 * ppr))
-
-    handle_radius = math.sqrt(radius**2 + handle_length**2)
-    htheta = math.acos(radius / handle_radius)
-
-    dz = length / (n_points)
-
-    for i in range(n_points):
-        z = length - (length * (i / (n_points - 1)))
-        polyline.bezier_points[i].co[0] = radius * math.cos(start_angle + dtheta * i)
-        polyline.bezier_points[i].co[1] = radius * math.sin(start_angle + dtheta * i)
-        polyline.bezier_points[i].co[2] = z
-
-        if clockwize:
-            handle_b = polyline.bezier_points[i].handle_left
-            handle_a = polyline.bezier_points[i].handle_right
-            tmpdz = -(dz / 2.0)
-        else:
-            handle_a = polyline.bezier_points[i].handle_left
-            handle_b = polyline.bezier_points[i].handle_right
-            tmpdz = dz / 2.0
-
-        handle_a[0] = handle_radius * math.cos(start_angle + (dtheta * i) - htheta)
-        handle_a[1] = handle_radius * math.sin(start_angle + (dtheta * i) - htheta)
-        handle_a[2] = z + tmpdz
-
-        handle_b[0] = handle_radius * math.cos(start_angle + (dtheta * i) + htheta)
-        handle_b[1] = handle_radius * math.sin(start_angle + (dtheta * i) + htheta)
-        handle_b[2] = z - tmpdz
+    polyline = curve_data.splines.new('BEZIER')
+    polyline.bezier_points.add(len(co) - 1)
+    bezier_points_from_arrays(polyline, co, handle_left, handle_right)
 
     return polyline
 
@@ -282,14 +499,32 @@ def make_bezier_helix(length, pitch, radius, clockwize, context):
 
     return ret
 
-## Calculate the length of a helix
-# @param radius Radius of the helix
-# @param pitch Number of revolutions per length unit of the helix
-# @param length Axial length of the helix
-# @return The length of the helix
-def helical_length(radius, pitch, length):
-    circ = 2.0 * radius * math.pi * length * pitch
-    return math.sqrt(circ**2 + length**2)
+## Upload vertex and polygon arrays to an empty mesh
+# @param mesh Mesh datablock to fill
+# @param verts Array of shape (n, 3) with vertex positions
+# @param loops Flat array of vertex indices for all polygons
+# @param loop_totals Number of vertices in each polygon
+# @param smooth Set smooth shading on all polygons
+def mesh_from_arrays(mesh, verts, loops, loop_totals, smooth=False):
+    verts = np.asarray(verts, dtype=np.float32).reshape(-1, 3)
+    loops = np.asarray(loops, dtype=np.int32)
+    loop_totals = np.asarray(loop_totals, dtype=np.int32)
+    loop_starts = np.zeros(len(loop_totals), dtype=np.int32)
+    np.cumsum(loop_totals[:-1], out=loop_starts[1:])
+
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set('co', verts.ravel())
+    mesh.loops.add(len(loops))
+    mesh.loops.foreach_set('vertex_index', loops)
+    mesh.polygons.add(len(loop_totals))
+    mesh.polygons.foreach_set('loop_start', loop_starts)
+    mesh.polygons.foreach_set('loop_total', loop_totals)
+
+    if smooth:
+        mesh.polygons.foreach_set('use_smooth',
+                                  np.ones(len(loop_totals), dtype=bool))
+
+    mesh.update(calc_edges=True)
 
 ## Creates a tubular mesh object
 #
@@ -297,62 +532,17 @@ def helical_length(radius, pitch, length):
 # @param inner_radius Inner radius of tube
 # @param length Length of the tube in Z-axis
 # @param context Context in which to create the tube
+# @param chord_error Largest distance between the mesh and a true cylinder
 # @return The new object
-def make_mesh_tube(outer_radius, inner_radius, length, context):
-    if inner_radius >= outer_radius:
-        raise InputError("Inner radius too big")
-    elif outer_radius <= 0.0:
-        raise InputError("Outer radius too small")
-
-    # Calculate points per revolution
-#TODO make this work properly
-    ppr = math.floor(3.7 * math.log(outer_radius) + 32.0)
-    ppr += ppr % 8
-    if ppr <= 0:
-        ppr = 4
-
-    verts = []
-    faces = []
-
-    dtheta = (2.0 * math.pi) / ppr
-    for i in range(ppr):
-        x = math.sin(i * dtheta)
-        y = math.cos(i * dtheta)
-
-        verts.append((x * outer_radius, y * outer_radius, 0))
-        verts.append((x * outer_radius, y * outer_radius, length))
-        verts.append((x * inner_radius, y * inner_radius, 0))
-        verts.append((x * inner_radius, y * inner_radius, length))
-
-        if i == 0:
-            continue
-
-        offs = i * 4
-
-        # Create side faces
-        faces.append((offs + 0, offs - 4, offs - 3, offs + 1))
-        faces.append((offs + 2, offs - 2, offs - 1, offs + 3))
-
-        # Create end faces
-        faces.append((offs + 0, offs + 2, offs - 2, offs - 4))
-        faces.append((offs + 1, offs + 3, offs - 1, offs - 3))
-
-    faces.append((0, ppr * 4 - 4, ppr * 4 - 3, 1))
-    faces.append((2, ppr * 4 - 2, ppr * 4 - 1, 3))
-    faces.append((0, 2, ppr * 4 - 2, ppr * 4 - 4))
-    faces.append((1, 3, ppr * 4 - 1, ppr * 4 - 3))
+def make_mesh_tube(outer_radius, inner_radius, length, context,
+                   chord_error=CHORD_ERROR):
+    arrays = cablegeom.mesh.tube(outer_radius, inner_radius, length,
+                                 chord_error)
 
     mesh = bpy.data.meshes.new("Tube")
     obj = bpy.data.objects.new("Tube", mesh)
     context.scene.objects.link(obj)
-    mesh.from_pydata(verts, [], faces)
-
-    mesh.update(calc_edges=True)
-    mesh.calc_normals()
-
-    # Set smooth shading
-    for p in mesh.polygons:
-        p.use_smooth = True
+    mesh_from_arrays(mesh, *arrays, smooth=True)
 
     # Add modifiers
     obj.modifiers.new('EdgeSplit', type="EDGE_SPLIT")
@@ -368,42 +558,17 @@ def make_mesh_tube(outer_radius, inner_radius, length, context):
 # @param length Length of the tube
 # @param radius Radius of the tube
 # @param context Context in wich to create the tube
+# @param chord_error Largest distance between the mesh and a true cylinder
 # 
 # @return The tube object
-def make_mesh_shell_tube(length, radius, context):
-    ppr = 16
-    dtheta = (2.0 * math.pi) / ppr
-    bm = bmesh.new()
+def make_mesh_shell_tube(length, radius, context, chord_error=CHORD_ERROR):
     obj = bpy.data.objects.new("ShellTube",
                                bpy.data.meshes.new("ShellTubeMesh"))
     context.scene.objects.link(obj)
 
-    # Create vertecies
-    for i in range(ppr):
-        x = radius * math.sin(i * dtheta)
-        y = radius * math.cos(i * dtheta)
-
-        bm.verts.new((x, y, 0))
-        bm.verts.new((x, y, length))
-
-    bm.verts.ensure_lookup_table()
-    # Create faces
-    for i in range(0, (ppr * 2) - 3, 2):
-        bm.faces.new((bm.verts[i], bm.verts[i + 1], bm.verts[i + 3],
-                      bm.verts[i + 2]))
-
-    # Create last face
-    bm.faces.new((bm.verts[0], bm.verts[(ppr * 2) - 2],
-                  bm.verts[(ppr * 2) - 1], bm.verts[1]))
-
-    bm.to_mesh(obj.data)
-
-    # Set smooth shading
-    for f in obj.data.polygons:
-        f.use_smooth = True
-
-    # Calculate normals
-    obj.data.update(1)
+    mesh_from_arrays(obj.data,
+                     *cablegeom.mesh.shell_tube(length, radius, chord_error),
+                     smooth=True)
 
     return obj
 
@@ -437,3 +602,152 @@ def make_tube_section(outer_radius, inner_radius, context):
     context.scene.objects.active = ret
 
     return ret
+
+## Remember the datablocks created by a function
+# Only the outermost tracked call compares the datablock collections, so
+# builders calling other builders are cheap
+# @param func The function
+# @return The wrapped function
+def tracked(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _track_depth[0] > 0:
+            return func(*args, **kwargs)
+
+        before = dict((name, set(d.as_pointer()
+                                 for d in getattr(bpy.data, name)))
+                      for name in TRACKED_COLLECTIONS)
+        _track_depth[0] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _track_depth[0] -= 1
+            for name in TRACKED_COLLECTIONS:
+                after = set(d.as_pointer() for d in getattr(bpy.data, name))
+                # Pointers of removed datablocks may be reused
+                _created[name].intersection_update(after)
+                _created[name].update(after - before[name])
+
+    return wrapper
+
+## Track the datablocks created by all public functions of a module
+# Call at the end of the module with globals(), before tracing.instrument
+# @param namespace Global namespace of the module
+# @param exclude Names of functions that are not tracked
+def track(namespace, exclude=()):
+    module = namespace['__name__']
+    for name, value in list(namespace.items()):
+        if name.startswith('_') or name in exclude or not callable(value) or \
+                isinstance(value, type) or \
+                getattr(value, '__module__', None) != module:
+            continue
+        namespace[name] = tracked(value)
+
+## Get the tracked datablocks that still exist
+# @param collections Names of the collections
+# @return Dictionary of collection name to list of datablocks
+def tracked_datablocks(collections=TRACKED_COLLECTIONS):
+    ret = {}
+    for name in collections:
+        pointers = _created[name]
+        ret[name] = [d for d in getattr(bpy.data, name)
+                     if d.as_pointer() in pointers]
+        # Forget datablocks that were removed by other means
+        pointers.intersection_update(d.as_pointer() for d in ret[name])
+
+    return ret
+
+## Estimate the memory used by the geometry of a datablock
+# @param data A mesh or curve
+# @return Approximate size in bytes
+def datablock_bytes(data):
+    ret = 0
+    if isinstance(data, bpy.types.Mesh):
+        for name in ('vertices', 'edges', 'loops', 'polygons'):
+            ret += len(getattr(data, name)) * ELEMENT_BYTES[name]
+    elif isinstance(data, bpy.types.Curve):
+        for spline in data.splines:
+            ret += len(spline.bezier_points) * ELEMENT_BYTES['bezier_points']
+            ret += len(spline.points) * ELEMENT_BYTES['points']
+
+    return ret
+
+# Name of the bpy.data collection holding a datablock, for the collections
+# cleaned by purge_orphans
+def _collection_name(data):
+    for name, cls in (('curves', bpy.types.Curve), ('meshes', bpy.types.Mesh),
+                      ('materials', bpy.types.Material)):
+        if isinstance(data, cls):
+            return name
+
+    return None
+
+## Remove tracked curves, meshes and materials that have no users
+# Materials used only by removed curves and meshes are removed as well, even if
+# they were not created by a tracked function. Other datablocks without users,
+# library data and data with a fake user are kept.
+# @param collections Names of the collections to clean
+# @param report Dictionary to add the counts to
+# @param dependents Further datablocks to remove if they have no users, such
+# as the data of removed objects
+# @return Dictionary with the number of removed datablocks per collection and
+# the approximate number of bytes reclaimed
+def purge_orphans(collections=PURGE_COLLECTIONS, report=None, dependents=()):
+    if report is None:
+        report = {'removed': {}, 'bytes': 0}
+
+    names = [name for name in collections if name != 'objects']
+    tracked = tracked_datablocks(names)
+    pending = [d for name in names for d in tracked[name]]
+    pending.extend(d for d in dependents if d is not None)
+    removed = set()
+
+    while pending:
+        d = pending.pop()
+        pointer = d.as_pointer()
+        # Check the pointer first. A removed datablock must not be accessed
+        if pointer in removed:
+            continue
+        name = _collection_name(d)
+        if name not in names or d.users > 0 or d.library is not None or \
+                d.use_fake_user:
+            continue
+
+        # Checked again once the datablock is gone
+        if name != 'materials':
+            pending.extend(m for m in d.materials if m is not None)
+
+        report['bytes'] += datablock_bytes(d)
+        report['removed'][name] = report['removed'].get(name, 0) + 1
+        _created[name].discard(pointer)
+        removed.add(pointer)
+        getattr(bpy.data, name).remove(d)
+
+    return report
+
+## Remove all tracked objects and the data that is left without users
+# Gives a clean scene between batch jobs without a snapshot of the scene
+# @param collections Names of the collections to clean
+# @return Dictionary with the number of removed datablocks per collection and
+# the approximate number of bytes reclaimed
+def reset_tracked(collections=PURGE_COLLECTIONS):
+    report = {'removed': {}, 'bytes': 0}
+    data = []
+
+    if 'objects' in collections:
+        objects = tracked_datablocks(('objects',))['objects']
+        for obj in objects:
+            data.append(obj.data)
+            for scene in obj.users_scene:
+                scene.objects.unlink(obj)
+            bpy.data.objects.remove(obj)
+        report['removed']['objects'] = len(objects)
+        _created['objects'].clear()
+
+    return purge_orphans(collections, report, data)
+
+track(globals(), exclude=('about_eq', 'rotate_point_xy', 'object_matrix',
+                          'transform_points', 'merge_materials', 'tracked',
+                          'track', 'tracked_datablocks', 'datablock_bytes',
+                          'purge_orphans', 'reset_tracked'))
+tracing.instrument(globals(), exclude=('about_eq',))
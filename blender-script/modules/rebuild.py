@@ -0,0 +1,179 @@
+## @package rebuild
+# Update generated objects in place when operator parameters change.
+# An operator describes its output as a list of components. Each component
+# names the parameters that require it to be rebuilt and the parameters that
+# can be applied to the existing objects. The parameters used are stored as
+# custom properties on the generated objects, so pressing "Make" again with
+# the generated object active only redoes the components whose parameters
+# changed.
+
+import bpy
+import rco
+
+## Custom property holding the bl_idname of the generating operator
+GENERATOR_PROPERTY = 'ct_generator'
+
+## Custom property holding the parameters the object was generated with
+PARAMS_PROPERTY = 'ct_params'
+
+## Custom property holding the component name of an object
+COMPONENT_PROPERTY = 'ct_component'
+
+
+## A generated part of an operator's output
+class Component:
+    ##
+    # @param name Name of the component. Unique within an operator
+    # @param build Function build(params, context) returning the new object
+    # @param depends Parameters that require the component to be rebuilt
+    # @param updates Sequence of (parameters, function) tuples. The function
+    # update(obj, params, context) is called when one of its parameters
+    # changed and the component is not rebuilt
+    def __init__(self, name, build, depends, updates=()):
+        self.name = name
+        self.build = build
+        self.depends = frozenset(depends)
+        self.updates = tuple((frozenset(p), f) for p, f in updates)
+
+
+##
+# @brief Find the generated root object to update
+# The active object, or one of its parents, must have been generated by the
+# operator
+#
+# @param generator bl_idname of the operator
+# @param context Current context
+#
+# @return The root object or None
+def find_root(generator, context):
+    obj = context.scene.objects.active
+    while obj is not None:
+        if obj.get(GENERATOR_PROPERTY) == generator:
+            return obj
+        obj = obj.parent
+
+    return None
+
+
+##
+# @brief Read the stored parameters of a root object
+#
+# @param root The root object
+#
+# @return Dictionary of parameters
+def stored_params(root):
+    params = root.get(PARAMS_PROPERTY)
+    if params is None:
+        return {}
+
+    return params.to_dict()
+
+
+##
+# @brief Names of the parameters that differ
+#
+# @param old Dictionary of parameters
+# @param new Dictionary of parameters
+#
+# @return Set of parameter names
+def changed_params(old, new):
+    return set(name for name in set(old) | set(new)
+               if old.get(name) != new.get(name))
+
+
+##
+# @brief Find the objects of each component below a root object
+#
+# @param root The root object
+#
+# @return Dictionary of component name to object
+def component_objects(root):
+    ret = {}
+    objects = [root]
+    for obj in objects:
+        name = obj.get(COMPONENT_PROPERTY)
+        if name is not None and name not in ret:
+            ret[name] = obj
+        objects.extend(obj.children)
+
+    return ret
+
+
+def _build(component, params, context):
+    obj = component.build(params, context)
+    obj[COMPONENT_PROPERTY] = component.name
+
+    return obj
+
+
+def _tag(root, generator, params):
+    root[GENERATOR_PROPERTY] = generator
+    root[PARAMS_PROPERTY] = params
+
+
+##
+# @brief Build or update the output of an operator
+# Components are built from scratch if no generated root is active or if the
+# root is missing one of them. A single component is its own root. Several
+# components are parented to an empty named after the operator.
+#
+# @param generator bl_idname of the operator
+# @param name Name of the root object when there are several components
+# @param components List of Component
+# @param params Dictionary of parameters. Values must be numbers, booleans
+# or strings
+# @param context Current context
+#
+# @return The root object
+def run(generator, name, components, params, context):
+    params = dict((k, int(v) if isinstance(v, bool) else v)
+                  for k, v in params.items())
+    root = find_root(generator, context)
+
+    if root is not None:
+        objects = component_objects(root)
+        if any(c.name not in objects for c in components):
+            rco.delete_object(root, context)
+            root = None
+
+    # Build everything
+    if root is None:
+        if len(components) == 1:
+            root = _build(components[0], params, context)
+        else:
+            root = bpy.data.objects.new(name, None)
+            context.scene.objects.link(root)
+            for component in components:
+                _build(component, params, context).parent = root
+
+        _tag(root, generator, params)
+        context.scene.objects.active = root
+        return root
+
+    changed = changed_params(stored_params(root), params)
+
+    for component in components:
+        obj = objects[component.name]
+
+        if changed & component.depends:
+            parent = obj.parent
+            rco.delete_object(obj, context)
+            obj = _build(component, params, context)
+            if len(components) == 1:
+                root = obj
+            else:
+                obj.parent = parent
+            continue
+
+        for update_params, update in component.updates:
+            if changed & update_params:
+                update(obj, params, context)
+
+    # Replaced components leave materials and profiles without users. Only
+    # data created by the builders is removed
+    rco.purge_orphans()
+
+    _tag(root, generator, params)
+    context.scene.objects.active = root
+
+    return root
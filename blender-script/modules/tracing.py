@@ -0,0 +1,206 @@
+## @package tracing
+# Opt-in timing spans written as Chrome trace event JSON.
+# Set the CT_TRACE environment variable to a directory to enable tracing. Every
+# public function of an instrumented module then records a span with the
+# number of datablocks and vertices it created. Open the written files in
+# chrome://tracing or https://ui.perfetto.dev. When CT_TRACE is not set the
+# modules are left untouched.
+
+import bpy
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+## Directory receiving trace files. Tracing is disabled when empty
+TRACE_DIR = os.environ.get('CT_TRACE', '')
+
+## Datablock collections counted by every span
+COUNTED_COLLECTIONS = ('objects', 'meshes', 'curves', 'materials',
+                       'node_groups')
+
+_events = []
+_lock = threading.Lock()
+_start = time.perf_counter()
+
+
+##
+# @brief Check if tracing is enabled
+#
+# @return True if TRACE_DIR is set
+def enabled():
+    return bool(TRACE_DIR)
+
+
+##
+# @brief Count datablocks
+#
+# @return Dictionary with the length of each counted collection
+def datablock_counts():
+    return dict((name, len(getattr(bpy.data, name)))
+                for name in COUNTED_COLLECTIONS)
+
+
+##
+# @brief Count the geometry of objects returned by a builder
+#
+# @param ret Return value of a builder
+#
+# @return Dictionary with vertex and spline point counts
+def geometry_counts(ret):
+    objects = ret if isinstance(ret, (tuple, list)) else [ret]
+    ret = {'vertices': 0, 'spline_points': 0}
+    for obj in objects:
+        data = getattr(obj, 'data', None)
+        if isinstance(data, bpy.types.Mesh):
+            ret['vertices'] += len(data.vertices)
+        elif isinstance(data, bpy.types.Curve):
+            for spline in data.splines:
+                ret['spline_points'] += len(spline.bezier_points) + \
+                    len(spline.points)
+
+    return ret
+
+
+## A timed span. Use as a context manager. Arguments added to args are shown
+# with the span.
+class Span:
+    def __init__(self, name, category='cabletools', args=None):
+        self.name = name
+        self.category = category
+        self.args = dict(args or {})
+
+    def __enter__(self):
+        self.counts = datablock_counts()
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = time.perf_counter()
+        counts = datablock_counts()
+        for name in COUNTED_COLLECTIONS:
+            created = counts[name] - self.counts[name]
+            if created:
+                self.args[name + '_created'] = created
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+
+        event = {'name': self.name, 'cat': self.category, 'ph': 'X',
+                 'ts': (self.begin - _start) * 1e6,
+                 'dur': (end - self.begin) * 1e6,
+                 'pid': os.getpid(), 'tid': threading.current_thread().ident,
+                 'args': self.args}
+        with _lock:
+            _events.append(event)
+
+        return False
+
+
+## Span that does nothing. Returned by span() when tracing is disabled
+class NullSpan:
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_null_span = NullSpan()
+
+
+##
+# @brief Create a span
+#
+# @param name Name of the span
+# @param category Category of the span
+# @param args Dictionary of arguments shown with the span
+#
+# @return A Span, or a NullSpan if tracing is disabled
+def span(name, category='cabletools', args=None):
+    if not enabled():
+        return _null_span
+    return Span(name, category, args)
+
+
+##
+# @brief Wrap a function in a span
+#
+# @param func The function
+# @param category Category of the span
+#
+# @return The wrapped function
+def traced(func, category):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with Span(func.__name__, category) as s:
+            ret = func(*args, **kwargs)
+            if ret is not None:
+                s.args.update(geometry_counts(ret))
+        return ret
+
+    return wrapper
+
+
+##
+# @brief Trace all public functions of a module
+# Call at the end of the module with globals(). Calls between functions of
+# the module are traced as nested spans. Does nothing if tracing is disabled.
+#
+# @param namespace Global namespace of the module
+# @param exclude Names of small helpers that are not traced
+def instrument(namespace, exclude=()):
+    if not enabled():
+        return
+
+    module = namespace['__name__']
+    for name, value in list(namespace.items()):
+        if name.startswith('_') or name in exclude or not callable(value) or \
+                isinstance(value, type) or \
+                getattr(value, '__module__', None) != module:
+            continue
+        namespace[name] = traced(value, module)
+
+
+##
+# @brief Forget all recorded events
+def reset():
+    with _lock:
+        del _events[:]
+
+
+##
+# @brief Write recorded events to a trace file and forget them
+#
+# @param filename Name of the file
+def write(filename):
+    with _lock:
+        events = list(_events)
+        del _events[:]
+
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+##
+# @brief Write the events of a job to TRACE_DIR
+#
+# @param job_id Identifier of the job. Used as file name
+#
+# @return Name of the written file, or None if tracing is disabled
+def write_job(job_id):
+    if not enabled():
+        return None
+
+    if not os.path.isdir(TRACE_DIR):
+        os.makedirs(TRACE_DIR)
+
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', os.path.basename(str(job_id)))
+    filename = os.path.join(TRACE_DIR, name + '.trace.json')
+    write(filename)
+
+    return filename
@@ -1,41 +1,24 @@
 #!/bin/python
 
 import inkex
-import math
+import os
 import simplepath
 import simplestyle
+import sys
+
+#Fall back to the blender modules when running from the source tree
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'blender-script', 'modules'))
+import cablegeom
 
 #Calculate positions of new circles given a difference in radius between the
 #outer and inner circles, and the radius of the inner circle
 def make_inner_circles(rc, rs):
     ret = []
 
-    while True:
-        no = int(math.floor((2.0 * math.pi * rc) / (2.0 * rs)))
-        ps = []
-        x0 = rc * math.cos( 0 * 2 * math.pi / no)
-        y0 = rc * math.sin( 0 * 2 * math.pi / no)
-        x1 = rc * math.cos( 1 * 2 * math.pi / no)
-        y1 = rc * math.sin( 1 * 2 * math.pi / no)
-        dist = math.sqrt((x0 - x1)**2 + (y0 - y1)**2)
-
-        if dist < 2.0 * rs:
-            no -= 1
-
-        for i in range(0, no):
-            x = rc * math.cos(i * 2 * math.pi / no)
-            y = rc * math.sin(i * 2 * math.pi / no)
-            ps.append(Circle(x, y, rs))
-
-        ret.append(ps)
-
-        rc_next = rc - (2.0 * rs)
-        if rc_next < rs:
-            if rc > 2.0 * rs:
-                ret.append([Circle(0, 0, rs)])
-            break
-        else:
-            rc = rc_next
+    layout = cablegeom.layout.ring_layout(rc, rs)
+    for ring in cablegeom.layout.positions(layout):
+        ret.append([Circle(x, y, rs) for x, y in ring])
 
     return ret
 